@@ -0,0 +1,167 @@
+/* Linear Streaming PLA Single Stream Compressor, shared library core for the Python LinearCompressor
+ * (python/linearnative.py), derived from linear-pla.c, MIT License.
+ *
+ * Please cite the publications listed in linear-pla.c when used.
+ */
+
+/* To compile:          gcc -std=gnu99 -O2 -ffp-contract=off -shared -fPIC linear-pla-lib.c -o liblinearpla.so */
+/* (no fused multiply-adds: they would round differently from Python) */
+
+/* Documentation:
+ * Same algorithm as linear-pla.c, but computing exactly as python/linear.py and the single stream protocol of
+ * python/compressor.py so that records are identical to the Python ones:
+ * - values, sums and (a,b) coefficients are doubles, timestamps are logical and global (x0, x0+1, ...),
+ * - sums of timestamps are exact integers as in Python,
+ * - segments end at maxn points, a segment of 2 points is flushed as a singleton if singletons is set,
+ * - the hulls keep at least 2 vertices and are tested as in linear.py (vertex 0, then binary search over the
+ *   others beyond HULLSCAN vertices).
+ * A call compresses a buffer of values; unless final is set, the segment still open at the end of the buffer is
+ * not output and *consumed tells from which value the next call must restart.
+ */
+
+#include <stdlib.h>
+
+#define DELTA               0.0000000001    // floating point error extra tolerence (linear.py)
+#define HULLSCAN            16              // hulls scanned linearly
+
+typedef __int128 INT;                       // exact sums of (squared) timestamps
+
+/* convex hulls of the error endpoints */
+
+typedef struct {
+    long *x;
+    double *y;
+    long size;
+} hull;
+
+double intersect(long x, long x0, double y0, long x1, double y1){
+    return ((y1-y0)*x+x1*y0-y1*x0)/(double)(x1-x0);
+}
+
+/* line a*x+b above a vertex of the upper hull (sign 1) or below one of the lower hull (sign -1) */
+int outside(hull *h, double a, double b, int sign){
+    long lo = 0, hi = h->size;
+
+    if(h->size > HULLSCAN){                 // first edge with slope >= a (<= a for the lower hull) from vertex 1,
+        long l = 1, r = h->size-1, mid;     // the hull being convex from there only: vertex 0 is tested alone
+        if(sign > 0 ? a*h->x[0]+b > h->y[0]+DELTA : a*h->x[0]+b < h->y[0]-DELTA)
+            return 1;
+        while(l < r){
+            mid = (l+r)/2;
+            if(sign > 0 ? h->y[mid+1]-h->y[mid] < a*(h->x[mid+1]-h->x[mid])
+                        : h->y[mid+1]-h->y[mid] > a*(h->x[mid+1]-h->x[mid]))
+                l = mid+1;
+            else
+                r = mid;
+        }
+        lo = l > 1 ? l-1 : 1;
+        hi = l+2 < h->size ? l+2 : h->size;
+    }
+
+    for(long i=lo; i<hi; i++){
+        if(sign > 0 ? a*h->x[i]+b > h->y[i]+DELTA : a*h->x[i]+b < h->y[i]-DELTA)
+            return 1;
+    }
+    return 0;
+}
+
+void push(hull *h, long x, double y, int sign){
+    while(h->size > 2 && (sign > 0 ? intersect(x, h->x[h->size-2], h->y[h->size-2], h->x[h->size-1], h->y[h->size-1]) > y
+                                   : intersect(x, h->x[h->size-2], h->y[h->size-2], h->x[h->size-1], h->y[h->size-1]) < y))
+        h->size -= 1;
+    h->x[h->size] = x;
+    h->y[h->size] = y;
+    h->size += 1;
+}
+
+/* linear compressor: records (count, a, b), singletons as (1, y, 0); returns the number of records or -1 */
+
+long linear_pla(const double *values, long n, long x0, double error, long maxn, int singletons, int final,
+                long *counts, double *as, double *bs, long *consumed){
+    long records = 0, i = 0, j, cnt, x;
+    INT sumx, sumx2;
+    double sumy, sumxy, a, b, newa, newb, y;
+    hull upper, lower;
+
+    upper.x = malloc((maxn+2)*sizeof(long));    upper.y = malloc((maxn+2)*sizeof(double));
+    lower.x = malloc((maxn+2)*sizeof(long));    lower.y = malloc((maxn+2)*sizeof(double));
+    if(!upper.x || !upper.y || !lower.x || !lower.y){
+        free(upper.x); free(upper.y); free(lower.x); free(lower.y);
+        return -1;
+    }
+
+    *consumed = n;
+    while(n-i >= 2){
+        /* Initialize a new PLA segment on values i, i+1 */
+        long xa = x0+i, xb = x0+i+1;
+        double ya = values[i], yb = values[i+1];
+        sumx = (INT)xa+xb;
+        sumy = ya+yb;
+        sumx2 = (INT)xa*xa+(INT)xb*xb;
+        sumxy = xa*ya+xb*yb;
+        a = (yb-ya)/(double)(xb-xa);
+        b = (xb*ya-yb*xa)/(double)(xb-xa);
+        upper.x[0] = xa;    upper.y[0] = ya+error;
+        upper.x[1] = xb;    upper.y[1] = yb+error;
+        lower.x[0] = xa;    lower.y[0] = ya-error;
+        lower.x[1] = xb;    lower.y[1] = yb-error;
+        upper.size = lower.size = 2;
+        cnt = 2;
+
+        /* Process datapoints */
+        for(j = i+2; j < n; j++){
+            if(cnt >= maxn)
+                break;
+
+            x = x0+j;
+            y = values[j];
+            sumx += x;
+            sumy += y;
+            sumx2 += (INT)x*x;
+            sumxy += x*y;
+
+            newa = ((cnt+1)*sumxy-(double)sumx*sumy) / (double)((cnt+1)*sumx2-sumx*sumx);
+            newb = (sumy-newa*(double)sumx) / (cnt+1);
+
+            if(!(y-error-DELTA <= x*newa+newb && x*newa+newb <= y+error+DELTA))
+                break;
+            if(outside(&upper, newa, newb, 1) || outside(&lower, newa, newb, -1))
+                break;
+
+            // New point accepted, now update the convex hulls and the best fit line
+            a = newa;
+            b = newb;
+            push(&upper, x, y+error, 1);
+            push(&lower, x, y-error, -1);
+            cnt += 1;
+        }
+
+        if(j == n){                             // end of buffer with an open segment
+            if(!final){
+                *consumed = i;
+                break;
+            }
+            counts[records] = cnt;  as[records] = a;  bs[records] = b;  records++;
+            i = n;
+        }
+        else if(singletons && cnt == 2){        // flush 1 isolated point
+            counts[records] = 1;  as[records] = values[i];  bs[records] = 0;  records++;
+            i += 1;
+        }
+        else{                                   // flush one segment
+            counts[records] = cnt;  as[records] = a;  bs[records] = b;  records++;
+            i = j;
+        }
+    }
+
+    if(n-i == 1){                               // a single value left
+        if(final){
+            counts[records] = 1;  as[records] = values[i];  bs[records] = 0;  records++;
+        }
+        else
+            *consumed = i;
+    }
+
+    free(upper.x); free(upper.y); free(lower.x); free(lower.y);
+    return records;
+}
@@ -9,14 +9,18 @@ Process a data stream of (x,y) tuples and generate a compressed stream by
 keeping track of the angle of possible lines from an initial point
 """
 class AngleCompressor(StreamCompressor):
+    __slots__ = ('i', 'j', 'amin', 'amax')
+
     def initialize(self,x0,y0,x1,y1):
         a, b, c, d = (x0, y0-self.error), (x1, y1+self.error), \
                      (x0, y0+self.error), (x1, y1-self.error)
         self.i, self.j = intersection(a,b,c,d)
-        self.slope = lambda x, y : (y-self.j)/(x-self.i)
         self.amin, self.amax = self.slope(x1, y1-self.error), \
                                self.slope(x1, y1+self.error)
 
+    def slope(self, x, y):
+        return (y-self.j)/(x-self.i)
+
     def check(self,x,y):
         return self.amin*x+self.j-self.amin*self.i > y+self.error or \
                self.amax*x+self.j-self.amax*self.i < y-self.error
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Benchmark of the hull test of the Linear compressor
+# Last modified 10/2026
+
+import argparse
+from time import perf_counter
+
+import linear
+from compressor import *
+
+"""
+Time the Linear compressor on one channel of a file for several segment
+bounds and errors, with the hulls scanned linearly (as before the binary
+search) and with the binary search; both must output the same records
+"""
+def benchlinear(filename, axis, bounds, errors, repeat=3):
+    data = list(logicaltimestream(streamfile(filename, axis)))
+    scan = linear.HULLSCAN
+
+    def run(bound, error, hullscan):
+        linear.HULLSCAN = hullscan
+        compressor = linear.LinearCompressor()
+        compressor.setprotocol(SingleStreamProtocol(bound))
+        best = float('inf')
+        for _ in range(repeat):
+            start = perf_counter()
+            records = list(compressor.compress(iter(data), error))
+            best = min(best, perf_counter()-start)
+        return records, best
+
+    print("Bound\t|     Error|  Segments|  Scan (s)|Search (s)|   Speedup")
+    myformatf = lambda f : "|"+'{:10.3f}'.format(f)
+    try:
+        for bound in bounds:
+            for error in errors:
+                records, tscan = run(bound, error, float('inf'))
+                records2, tsearch = run(bound, error, scan)
+                assert records == records2, "different records"
+                print('{:8}'.format(bound) + "|"+'{:10}'.format(error)
+                      + "|"+'{:10}'.format(len(records)) + myformatf(tscan)
+                      + myformatf(tsearch) + myformatf(tscan/tsearch))
+    finally:
+        linear.HULLSCAN = scan
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="""
+                Benchmark the hull test of the Linear compressor.""")
+    parser.add_argument("target", nargs='?',
+                        default="../testdata/sin_testdata.txt",
+                        help="csv file; default=../testdata/sin_testdata.txt")
+    parser.add_argument("-a", "--axis", default=1, type=int,
+                        help="column to compress; default=1")
+    parser.add_argument("-b", "--bnd", default="255,4096,65536",
+                        help="segment length bounds; default=255,4096,65536")
+    parser.add_argument("-e", "--errors", default="0.05,0.5,2",
+                        help="maximum errors; default=0.05,0.5,2")
+    args = parser.parse_args()
+
+    benchlinear(args.target, args.axis,
+                [int(b) for b in args.bnd.split(',')],
+                [float(e) for e in args.errors.split(',')])
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# Benchmark of the compressors under the protocols on several datasets
+# Last modified 10/2026
+
+import argparse
+import json
+import platform
+import tracemalloc
+from datetime import datetime
+from importlib import import_module
+from itertools import count
+from math import sin
+from random import Random
+from time import perf_counter
+
+from compressor import *
+from plastats import METHODS
+
+PROTOCOLS = {'single': SingleStreamProtocol,
+             'lidar': SingleStreamLidarProtocol,
+             'variant': SingleStreamVariantProtocol,
+             'twostreams': TwoStreamsProtocol}
+
+DATASETS = ['../testdata/sin_testdata.txt', '../testdata/jagged_testdata.txt']
+
+"""
+Generated large series: a noisy random walk on a slow sine wave, at logical
+timestamps
+"""
+def genseries(n, seed=0):
+    rand, y = Random(seed), 0.0
+    for x in range(1, n+1):
+        y += rand.gauss(0, 0.01)
+        yield (x, sin(x/1000)+y+rand.uniform(-0.02, 0.02))
+
+"""
+Compressed size in bytes of records: their weights under the protocol
+(values of inputsize bytes) converted back to bytes
+"""
+def recordbytes(protocol, records):
+    time = count(1)
+    return sum(protocol.reconstruct(record, time)[1]
+               for record in records)*protocol.inputsize
+
+"""
+Time one method under one protocol on a dataset (best of repeat runs), then
+measure its peak memory in a separate traced run
+"""
+def benchone(makecompressor, protocol, data, error, repeat=3):
+    def run():
+        compressor = makecompressor()
+        compressor.setprotocol(protocol)
+        return list(compressor.compress(iter(data), error))
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        records = run()
+        best = min(best, perf_counter()-start)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'points': len(data), 'records': len(records), 'seconds': best,
+            'points/s': len(data)/best, 'records/s': len(records)/best,
+            'peak bytes': peak,
+            'bytes/point': recordbytes(protocol, records)/len(data)}
+
+def benchpla(methods, protocols, datasets, errors, repeat=3, verbose=True):
+    results = {}
+    for name, data in datasets:
+        for error in errors:
+            for method in methods:
+                module, maker = METHODS[method]
+                makecompressor = getattr(import_module(module), maker)
+                for proto in protocols:
+                    key = "/".join((method, proto, name, str(error)))
+                    results[key] = benchone(makecompressor,
+                                            PROTOCOLS[proto](255), data,
+                                            error, repeat)
+                    if verbose:
+                        printresult(key, results[key])
+    return results
+
+def printresult(key, result, baseline=None):
+    line = '{:44}'.format(key) + "|" + '{:10.0f}'.format(result['points/s']) \
+           + "|" + '{:10.0f}'.format(result['records/s']) \
+           + "|" + '{:10.1f}'.format(result['peak bytes']/1024) \
+           + "|" + '{:10.3f}'.format(result['bytes/point'])
+    if baseline is not None:
+        line += "|" + '{:+9.1f}%'.format(speedchange(result, baseline))
+    print(line)
+
+def speedchange(result, baseline):
+    return 100*(result['points/s']/baseline['points/s']-1)
+
+"""
+Compare results to a baseline: returns the keys whose throughput dropped by
+more than tolerance (a fraction) or whose output size changed
+"""
+def compare(results, baseline, tolerance=0.1):
+    print('{:44}'.format("Method/protocol/dataset/error")
+          + "|  Points/s| Records/s| Peak (KB)|Bytes/pnt|  Speed")
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        printresult(key, result, baseline[key])
+        if result['points/s'] < (1-tolerance)*baseline[key]['points/s'] or \
+           result['records'] != baseline[key]['records']:
+            regressions.append(key)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="""
+                Benchmark the compressors under the protocols: points/s,
+                records/s, peak memory and compressed bytes per point.""")
+    parser.add_argument("datasets", nargs='*', default=DATASETS,
+                        help="csv files (channel 1 compressed); default="
+                        + ",".join(DATASETS))
+    parser.add_argument("-M", "--methods", default="angle,linear,convexhull",
+                        help="""methods among """ + ", ".join(METHODS)
+                        + """; default=angle,linear,convexhull""")
+    parser.add_argument("-P", "--protocols", default=",".join(PROTOCOLS),
+                        help="protocols; default=" + ",".join(PROTOCOLS))
+    parser.add_argument("-e", "--errors", default="0.05",
+                        help="maximum errors; default=0.05")
+    parser.add_argument("-N", "--generated", default=200000, type=int,
+                        help="""size of the generated series added to the
+                        datasets (0 for none); default=200000""")
+    parser.add_argument("-r", "--repeat", default=3, type=int,
+                        help="timed runs, the best is kept; default=3")
+    parser.add_argument("-o", "--output",
+                        help="save the results as JSON to this file")
+    parser.add_argument("-c", "--compare",
+                        help="""compare to the results of a JSON file saved
+                        with -o; exits with 1 upon regressions""")
+    parser.add_argument("-T", "--tolerance", default=0.1, type=float,
+                        help="""throughput drop tolerated by --compare;
+                        default=0.1""")
+    args = parser.parse_args()
+
+    datasets = [(basename, list(logicaltimestream(streamfile(filename, 1))))
+                for filename, basename in
+                ((f, f.split('/')[-1].split('.')[0]) for f in args.datasets)]
+    if args.generated:
+        datasets.append(("generated%d" % args.generated,
+                         list(genseries(args.generated))))
+
+    if not args.compare:
+        print('{:44}'.format("Method/protocol/dataset/error")
+              + "|  Points/s| Records/s| Peak (KB)|Bytes/pnt")
+    results = benchpla(args.methods.split(','), args.protocols.split(','),
+                       datasets, [float(e) for e in args.errors.split(',')],
+                       args.repeat, verbose=not args.compare)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'date': datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'results': results}, f, indent=1)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions:", ", ".join(regressions))
+            exit(1)
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# Block Linear Compressor, vectorized NumPy engine for the Linear method
+# Last modified 10/2026
+
+from itertools import islice
+
+import numpy as np
+
+from linear import *
+
+DEPTH = 8                                       # depths resolved in bulk
+SPAN = 4096                                     # start positions per bulk pass
+WINDOW = 512                                    # largest batched window
+ROWS = 16                                       # depths tested at once
+BLOCKSIZE = 65536                               # tuples per chunk from a stream
+
+EPS = np.finfo(float).eps
+COUNTS = np.arange(1, WINDOW+1)
+BEFORE = np.where(np.tri(WINDOW, WINDOW, dtype=bool), 0.0, -np.inf)
+
+"""
+Compress whole arrays (or chunks from a stream) with the Linear method and the
+single stream protocol. Segment boundaries are found in bulk: short segments
+for many start positions at once, longer ones with running sums over a window
+and a batched test of the candidate lines against all the window's points.
+Records are the exact (n,a,b) / (1,y) ones of SingleStreamProtocol.compress.
+"""
+class BlockLinearCompressor(LinearCompressor):
+    def compressarray(self, ys, error, xs=None):
+        if xs is None:                          # logical timestamps
+            xs = np.arange(1, len(ys)+1)
+        chunks = ((xs[i:i+BLOCKSIZE], ys[i:i+BLOCKSIZE])
+                  for i in range(0, len(ys), BLOCKSIZE))
+        yield from self.compresschunks(chunks, error)
+
+    def compressblocks(self, data, error, blocksize=BLOCKSIZE):
+        def chunks():
+            while True:
+                block = list(islice(data, blocksize))
+                if not block:
+                    return
+                xs, ys = zip(*block)
+                yield np.array(xs), np.array(ys, dtype=float)
+
+        data = iter(data)
+        yield from self.compresschunks(chunks(), error)
+
+    def compresschunks(self, chunks, error):
+        self.error = error
+        protocol = self.protocol
+
+        # quantized records or latency bound: per point
+        engine = protocol.quantizer is None and not protocol.bounded()
+        if engine and isinstance(protocol, SingleStreamLidarProtocol):
+            for record in self.blockcompress(chunks, protocol.maxn, True):
+                if record[0] > 1 and record[1] == 0:
+                    yield (-record[0], record[2])
+                else:
+                    yield record
+        elif engine and type(protocol) is SingleStreamProtocol:
+            yield from self.blockcompress(chunks, protocol.maxn,
+                                          protocol.singletons)
+        else:                                   # no block engine: per point
+            data = ((x, y) for xs, ys in chunks
+                    for x, y in zip(np.asarray(xs).tolist(),
+                                    np.asarray(ys, dtype=float).tolist()))
+            yield from self.compress(data, error)
+
+    def blockcompress(self, chunks, maxn, singletons):
+        last = max(maxn, 2)                     # depth of a forced flush
+        chunks = iter(chunks)
+        xs = ys = previous = None               # previous: (x1, last segment)
+        s, ended, self.guess = 0, False, 0
+
+        while True:
+            if not ended and (xs is None or len(xs)-s <= last):
+                try:
+                    cx, cy = next(chunks)
+                except StopIteration:
+                    ended = True
+                else:
+                    cx, cy = np.asarray(cx), np.asarray(cy, dtype=float)
+                    if xs is None:
+                        xs, ys = cx, cy
+                    else:
+                        xs = np.concatenate((xs[s:], cx))
+                        ys = np.concatenate((ys[s:], cy))
+                    s, xl = 0, None
+                continue
+
+            if xs is None or len(xs) == s:      # empty stream
+                return
+
+            if xl is None:                      # new buffer
+                self.prepare(xs, ys)
+                xl, yl = xs.tolist(), ys.tolist()
+                start, depth = 0, []
+
+            if s-start >= len(depth) and self.guess < DEPTH:
+                start = s
+                depth, A, B = self.shallow(xs, ys, last, s, s+SPAN)
+
+            if s-start < len(depth) and depth[s-start]:
+                k, a, b = depth[s-start], A[s-start], B[s-start]
+            elif len(xs)-s == 1:                # dried out after a segment
+                if previous is None or previous[0] < xl[s]:
+                    yield (1, yl[s])
+                else:
+                    yield previous[1]
+                return
+            else:
+                k, a, b = self.scan(xs, ys, xl, yl, s, last)
+
+                if k is None:                   # dried out within a segment
+                    if xl[s+1] < xl[s]:
+                        yield (1, yl[s])
+                    else:
+                        yield (len(xs)-s, a, b)
+                    return
+
+            self.guess = (3*self.guess+k)//4
+            if singletons and k == 2:           # Flush 1 isolated point
+                yield (1, yl[s])
+                s += 1
+            else:                               # Flush one segment
+                previous = (xl[s+1], (k, a, b))
+                yield previous[1]
+                s += k
+
+    def prepare(self, xs, ys):
+        """arrays of a buffer shared by the bulk and window passes"""
+        self.xf = xs.astype(float)
+        self.xy = self.xf*ys
+        self.hi = ys+self.error+DELTA           # as in LinearCompressor.check
+        self.lo = ys-self.error-DELTA
+
+        # Integer timestamps have exact sums in the original method: shifted
+        # to the buffer start they stay exact as doubles within a window.
+        shift = self.xf-self.xf[0]
+        self.exact = xs.dtype.kind in 'iu' and \
+                     (WINDOW*np.abs(shift).max())**2 < 2**53
+        if xs.dtype.kind in 'iu':
+            self.sums = np.vstack((self.xf, ys, self.xy, shift, shift*shift))
+        else:
+            self.sums = np.vstack((self.xf, ys, self.xy, self.xf*self.xf))
+
+        # A point off the hulls lies above (below) them up to the rounding of
+        # the intersections that removed it: lines missing such a point by
+        # more than this slack also miss a hull vertex.
+        gap = np.diff(self.xf).min() if len(xs) > 1 else 1.0
+        x = np.abs(self.xf).max()
+        y = max(np.abs(self.hi).max(), np.abs(self.lo).max())
+        self.slack = 64*EPS*(x*y/gap+y) if gap > 0 else float('inf')
+
+    def shallow(self, xs, ys, last, start, stop):
+        """failing depths below DEPTH for the start positions in [start,stop)
+        (0: unresolved) with the coefficients of the corresponding records"""
+        m = min(stop, len(xs)-DEPTH+1)-start
+        if m <= 0:
+            return [], [], []
+
+        integer = xs.dtype.kind in 'iu'
+        X = [self.xf[start+i:start+i+m] for i in range(DEPTH)]
+        Y = [ys[start+i:start+i+m] for i in range(DEPTH)]
+        H = [self.hi[start+i:start+i+m] for i in range(DEPTH)]
+        L = [self.lo[start+i:start+i+m] for i in range(DEPTH)]
+        XY = [self.xy[start+i:start+i+m] for i in range(DEPTH)]
+        xmax = np.maximum(np.abs(X[0]), np.abs(X[-1]))
+
+        sumx, sumy, sumxy = X[0]+X[1], Y[0]+Y[1], XY[0]+XY[1]
+        if integer:                             # exact integer denominators
+            D = [xs[start+i:start+i+m]-xs[start:start+m] for i in range(DEPTH)]
+            sumd, sumd2 = D[1], D[1]*D[1]
+        else:
+            sumx2 = X[0]*X[0]+X[1]*X[1]
+
+        depth = np.zeros(m, dtype=int)
+        pending = np.ones(m, dtype=bool)
+        A, B = np.zeros(m), np.zeros(m)
+
+        with np.errstate(all='ignore'):
+            a = (Y[1]-Y[0])/(X[1]-X[0])         # coefficients at depth 2
+            b = (X[1]*Y[0]-Y[1]*X[0])/(X[1]-X[0])
+
+            for k in range(2, min(DEPTH, last)):
+                olda, oldb, n = a, b, k+1
+                sumx = sumx+X[k]
+                sumy = sumy+Y[k]
+                sumxy = sumxy+XY[k]
+                if integer:
+                    sumd = sumd+D[k]
+                    sumd2 = sumd2+D[k]*D[k]
+                    den = (n*sumd2-sumd*sumd).astype(float)
+                else:
+                    sumx2 = sumx2+X[k]*X[k]
+                    den = n*sumx2-sumx*sumx
+
+                a = (n*sumxy-sumx*sumy)/den
+                b = (sumy-a*sumx)/n
+                est = X[k]*a+b
+                sure = ~((L[k] <= est) & (est <= H[k]))
+                fail = sure.copy()
+                slack = self.slack*DEPTH+8*EPS*(np.abs(a)*xmax+np.abs(b))
+
+                # points 0, 1 and k-1 are always on both hulls, the others
+                # were removed from them up to the slack
+                for i in range(k):
+                    line = a*X[i]+b
+                    out = np.maximum(line-H[i], L[i]-line)
+                    if i < 2 or i == k-1:
+                        sure |= out > 0
+                    else:
+                        fail |= out > 0
+                        sure |= out > slack
+
+                new = pending & (fail | sure)
+                done = new & sure
+                depth[done], A[done], B[done] = k, olda[done], oldb[done]
+                pending &= ~new
+
+        if last < DEPTH:                        # forced flush at depth last
+            depth[pending], A[pending], B[pending] = last, a[pending], b[pending]
+
+        return depth.tolist(), A.tolist(), B.tolist()
+
+    def scan(self, xs, ys, xl, yl, s, last):
+        """(depth of the failing point or None, a, b) of the segment at s"""
+        avail = len(xs)-s
+        top = min(avail, last, WINDOW)
+        w = min(top, max(4*ROWS, 2*self.guess))
+        A, B = self.lines(xs, s, w)
+        k, j, rows = 2, None, max(ROWS, self.guess+self.guess//4)
+
+        while True:                             # test depths by row blocks
+            if k == w and w < top:              # widen the window
+                w = min(top, 4*w)
+                A, B = self.lines(xs, s, w)
+            if k == w:
+                break
+            end = min(w, k+rows)
+            j, ambiguous = self.test(s, A, B, k, end)
+            if ambiguous:
+                return self.replay(xl[s:s+last+1], yl[s:s+last+1], j, last)
+            if j is not None:
+                k = j
+                break
+            k, rows = end, 2*rows
+
+        if j is None:
+            if w < min(avail, last):            # window exhausted
+                return self.replay(xl[s:s+last+1], yl[s:s+last+1], w, last)
+            k = last if avail > last else None
+
+        j = w-1 if k is None else k-1
+        if j < 2:
+            a, b = coefficients(xl[s], yl[s], xl[s+1], yl[s+1])
+        else:
+            a, b = A[j].item(), B[j].item()
+        return k, a, b
+
+    def lines(self, xs, s, w):
+        """best-fit lines through the first 1..w points from s"""
+        sums = self.sums[:, s:s+w].cumsum(axis=1)
+        sumx, sumy, sumxy = sums[:3]
+        n = COUNTS[:w]
+
+        with np.errstate(all='ignore'):
+            if len(sums) == 4:
+                den = n*sums[3]-sumx*sumx
+            elif self.exact:
+                den = n*sums[4]-sums[3]*sums[3]
+            else:                               # exact integer denominators
+                d = xs[s:s+w]-xs[s]
+                sumd = d.cumsum()
+                den = (n*(d*d).cumsum()-sumd*sumd).astype(float)
+
+            a = (n*sumxy-sumx*sumy)/den
+            b = (sumy-a*sumx)/n
+        return a, b
+
+    def test(self, s, A, B, start, end):
+        """first failing depth in [start, end) and if it is uncertain"""
+        xf = self.xf[s:s+end]
+
+        # row k: the line at depth k against the points up to k included
+        with np.errstate(all='ignore'):
+            lines = np.multiply.outer(A[start:end], xf)+B[start:end, None]
+            out = np.maximum(lines-self.hi[s:s+end], self.lo[s:s+end]-lines)
+        out += BEFORE[start:end, :end]
+
+        fail = (out > 0).any(axis=1)
+        i = int(fail.argmax())
+        if not fail[i]:
+            return None, False
+
+        # points 0, 1 and k-1 are always on both hulls, the others were
+        # removed from them up to the slack
+        k, row = start+i, out[i]
+        slack = self.slack*end+8*EPS*(abs(A[k])*max(abs(xf[0]), abs(xf[-1]))
+                                      +abs(B[k]))
+        sure = row[k] > 0 or row[0] > 0 or row[1] > 0 or row[k-1] > 0 \
+               or row.max() > slack
+        return k, not sure
+
+    def replay(self, x, y, k, last):
+        """rebuild the hulls up to depth k and continue point by point"""
+        self.initialize(x[0], y[0], x[1], y[1])
+
+        for i in range(2, len(x)):
+            if i >= last:
+                return last, self.a, self.b
+            if i >= k and self.check(x[i], y[i]):
+                return i, self.a, self.b
+            if i < k:                           # known to fit: skip the check
+                self.sumx += x[i]
+                self.sumy += y[i]
+                self.sumx2 += x[i]*x[i]
+                self.sumxy += x[i]*y[i]
+                self.n += 1
+                self.newa = (self.n*self.sumxy-self.sumx*self.sumy) \
+                           /(self.n*self.sumx2-self.sumx*self.sumx)
+                self.newb = (self.sumy-self.newa*self.sumx)/self.n
+            self.update(x[i], y[i])
+
+        return None, self.a, self.b
+
+def makecompressorblocklinear():
+    return BlockLinearCompressor()
+
+# MAIN: File streaming part, process a single file or directory
+if __name__ == "__main__":
+    from plastats import processfile
+    processfile(makecompressorblocklinear)
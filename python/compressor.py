@@ -2,8 +2,13 @@
 # Generic Compressor, Romaric Duvignau, duvignau@chalmers.se, 01/2018
 # Last modified 09/2018
 
-from itertools import tee
-from math import ceil
+from functools import partial
+from itertools import tee, count
+from collections import deque
+from math import ceil, inf, frexp, ldexp
+import mmap
+import struct
+from sys import stderr
 
 ### 2D utils
 
@@ -25,52 +30,208 @@ def intersection(a, b, c, d):
 
 ### Streaming utils
 
+CHUNKSIZE = 1 << 20                             # bytes of lines parsed at once
+
 """
-Stream an input file passed as parameter, and ouput the result of compression
+Chunked CSV parser: reads a text file by blocks of whole lines and parses each
+block at once, split into a flat list of fields whose columns are sliced and
+converted by map; blocks with rows of another length or malformed rows are
+parsed row by row. A row is malformed for an axis when its time (channel 0)
+or its value is missing or not a number: it is skipped, counted in malformed
+and appended to the log file if given, and a single line on stderr gives the
+count at the end
 """
-def stream(f, axis, separator=','):
-    n = 0
-    lastt = None
-    for line in f:
+class CSVReader():
+    def __init__(self, f, separator=',', log=None, chunksize=CHUNKSIZE):
+        self.f = f
+        self.separator = separator
+        self.log = log                          # filename of malformed rows
+        self.chunksize = chunksize
+        self.rows = 0                           # lines read
+        self.malformed = 0
+        self.name = getattr(f, 'name', '<stream>')
+
+    # parsed blocks: dicts of (xs, ys) lists for each axis, as the tuples of
+    # streamfile (axis 0: line numbers and channel 0)
+    def batches(self, axes):
+        log = None
         try:
-            values = line.split(separator)
-            n += 1
-            
-            if axis > 0:
-                #if not lastt or float(values[0]) > lastt:
-                yield (float(values[0]), float(values[axis]))
-                #lastt = float(values[0])
-            else:
-                yield (n, float(values[0]))
-        
-        except ValueError:                          # malformed records
-            print("Malformed tuple in file", f, "on line no", n, ":", line)
+            while True:
+                text = self.f.read(self.chunksize)
+                if not text:
+                    break
+                if not text.endswith("\n"):
+                    text += self.f.readline()
+                batch, bad, rows = self.parse(text, axes)
+                if bad:
+                    self.malformed += len(bad)
+                    if self.log is not None:
+                        if log is None:
+                            log = open(self.log, "a")
+                        log.writelines("%s:%d:%s\n" % (self.name, n, line)
+                                       for n, line in bad)
+                self.rows += rows
+                yield batch
+        finally:
+            if log is not None:
+                log.close()
+
+        if self.malformed:
+            print(self.malformed, "malformed rows in", self.name,
+                  *(() if self.log is None else ("logged to", self.log)),
+                  file=stderr)
+
+    def parse(self, text, axes):
+        sep = self.separator
+        ends = text.count("\n")
+        rows = ends + (not text.endswith("\n"))
+        k = text.partition("\n")[0].count(sep) + 1
+        fields = text.replace("\n", "\n"+sep).split(sep)
+        if text.endswith("\n"):
+            fields.pop()
+
+        # same number of fields on each row: the line ends are all in the
+        # last column
+        if len(fields) == rows*k and \
+           "".join(fields[k-1::k]).count("\n") == ends and max(axes) < k:
+            try:
+                t = list(map(float, fields[0::k]))
+                return {axis: (t, list(map(float, fields[axis::k])))
+                              if axis > 0 else
+                              (list(range(self.rows+1, self.rows+rows+1)), t)
+                        for axis in axes}, [], rows
+            except ValueError:                  # malformed records
+                pass
+
+        lines = text.split("\n")
+        if text.endswith("\n"):
+            lines.pop()
+        batch = {axis: ([], []) for axis in axes}
+        bad = []
+        for n, line in enumerate(lines, self.rows+1):
+            values = line.split(sep)
+            try:
+                t = float(values[0])
+            except ValueError:
+                bad.append((n, line))
+                continue
+
+            malformed = False
+            for axis in axes:
+                try:
+                    y = float(values[axis]) if axis > 0 else t
+                except (ValueError, IndexError):
+                    malformed = True
+                    continue
+                xs, ys = batch[axis]
+                xs.append(n if axis == 0 else t)
+                ys.append(y)
+            if malformed:
+                bad.append((n, line))
+        return batch, bad, rows
+
+    def tuples(self, axis):
+        for batch in self.batches([axis]):
+            yield from zip(*batch[axis])
+
+"""
+Stream an input file passed as parameter, and ouput the result of compression
+"""
+def stream(f, axis, separator=',', log=None):
+    yield from CSVReader(f, separator, log).tuples(axis)
+
+def streamfile(filename, axis=1, separator=',', log=None):
+    if isinstance(separator, BinaryFormat):
+        channels = mapbinfile(filename, separator)
+        if axis > 0:
+            yield from zip(channels[0], channels[axis])
+        else:
+            yield from zip(count(1), channels[0])
+        return
 
-def streamfile(filename, axis=1, separator=','):
     with open(filename, "r") as f:
-        for r in stream(f, axis, separator):
-            yield r
+        yield from stream(f, axis, separator, log)
             
+"""
+Stream a file once into the (x,y) tuples that streamfile would yield for each
+of the given axes: one iterator per axis, the rows being parsed as the most
+advanced of them needs them and kept for the others until they get there
+"""
+def streamaxes(filename, axes, separator=',', log=None):
+    if isinstance(separator, BinaryFormat):
+        return {axis: streamfile(filename, axis, separator) for axis in axes}
+
+    def parse():
+        with open(filename, "r") as f:
+            yield from CSVReader(f, separator, log).batches(axes)
+
+    batches = parse()
+    pending = {axis: deque() for axis in axes}  # parsed (xs, ys) per axis
+
+    def tuples(axis):
+        queue = pending[axis]
+        while True:
+            while not queue:
+                batch = next(batches, None)
+                if batch is None:
+                    return
+                for i in axes:
+                    pending[i].append(batch[i])
+            yield from zip(*queue.popleft())
+
+    return {axis: tuples(axis) for axis in axes}
+
 """
 Stream the timestamps only
 """
-def streamtime(f, separator=',', cast=float):
-    for line in f:
-        yield cast(line.split(separator)[0])
+def streamtime(f, separator=',', cast=float, log=None):
+    for (n, t) in stream(f, 0, separator, log):
+        yield cast(t)
 
-def streamtimefile(filename, separator=',', cast=float):
-    with open(filename, "r") as f:
-        for line in f:
-            yield cast(line.split(separator)[0])
+def streamtimefile(filename, separator=',', cast=float, log=None):
+    if isinstance(separator, BinaryFormat):
+        yield from map(cast, mapbinfile(filename, separator)[0])
+        return
 
-def streamfilelogicaltime(filename, axis, separator=','):
-    i = 1
     with open(filename, "r") as f:
-        for line in f:
-            values = line.split(separator)
-            yield i, float(values[axis])
-            i += 1
+        yield from streamtime(f, separator, cast, log)
+
+def streamfilelogicaltime(filename, axis, separator=',', log=None):
+    if isinstance(separator, BinaryFormat):
+        yield from zip(count(1), mapbinfile(filename, separator)[axis])
+        return
+
+    yield from logicaltimestream(streamfile(filename, axis, separator, log))
         
+"""
+Float binary input files: C/csv2bin output (a single channel) or several
+channels interleaved row by row; passed instead of a column separator
+"""
+class BinaryFormat():
+    def __init__(self, columns=1, size=4):
+        if size not in (4, 8):
+            raise ValueError("binary values are floats (4) or doubles (8)")
+        self.columns = columns
+        self.typecode = 'f' if size == 4 else 'd'
+        self.size = size
+
+"""
+Memory map a binary file and return a zero-copy view on each of its channels
+(a trailing incomplete row is ignored)
+"""
+def mapbinfile(filename, binformat):
+    columns = binformat.columns
+    rowsize = binformat.size*columns
+
+    with open(filename, "rb") as f:
+        try:
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except ValueError:                          # empty file
+            view = memoryview(b'')
+
+    view = view[:len(view)//rowsize*rowsize].cast(binformat.typecode)
+    return [view[i::columns] for i in range(columns)]
+
 def approximatedtimestream(timestream, datastream):
     oldt = None
     for (x,y) in datastream:
@@ -93,6 +254,14 @@ def logicaltimes(datastream):
         yield i
         i += 1
 
+"""
+Tuples (x,(y1,...,yk)) of several channels read in step, with the timestamps
+of the first one, until the shortest channel ends
+"""
+def jointstream(datastreams):
+    for points in zip(*datastreams):
+        yield points[0][0], tuple(y for (x,y) in points)
+
 
 ### Streaming Compressor Protocols Implementation
             
@@ -100,6 +269,8 @@ def logicaltimes(datastream):
 Template for sequential streaming processor
 """
 class StreamCompressor():
+    __slots__ = ('protocol', 'bound', 'error')
+
     def __init__(self, param='c', bound=255):
         self.parametrize(param, bound)
         self.bound = bound
@@ -128,9 +299,41 @@ class StreamCompressor():
             self.protocol = SingleStreamVariantProtocol(bound, boundbytes)
 
 
+    # with a quantizer, the records are quantized against their points and
+    # the compressor fits within the error minus the slack, which grows with
+    # the largest value read so far
     def compress(self, data, error):
-        self.error = error
-        yield from self.protocol.compress(self, data)
+        protocol = self.protocol
+        if protocol.quantizer is None:
+            self.error = error
+            yield from protocol.compress(self, data)
+            return
+
+        self.error, slack = protocol.tolerance(error)
+        points = deque()
+        def tracked():
+            magnitude = None
+            for x, y in data:
+                points.append((x, y))
+                m = protocol.magnitude(y, magnitude)
+                if m != magnitude:
+                    magnitude = m
+                    self.error = protocol.tolerance(error, m)[0]
+                yield x, y
+        time = iter(points.popleft, None)
+        for record in protocol.compress(self, tracked()):
+            yield from protocol.quantize(record, time, error, slack)
+
+    # push interface: feed(x,y) and close() of the returned protocol state
+    def feeder(self, error):
+        protocol = self.protocol
+        if protocol.quantizer is None:
+            self.error = error
+            return protocol.feeder(self)
+
+        from plafeed import QuantizedFeeder
+        self.error, slack = protocol.tolerance(error)
+        return QuantizedFeeder(protocol, protocol.feeder(self), error, slack)
         
     def reconstruct(self, record, timestream):
         try:
@@ -138,13 +341,20 @@ class StreamCompressor():
         except StopIteration:
             raise ValueError("given timestream exhausted!")
 
-    def genplastream(self, datastream, error, timestream):
+    def genplastream(self, datastream, error, timestream=None):
         def databuffered(data, buffer):
             for x in data:
                 buffer.append(x)
+                if owntimes:
+                    times.append(x[0])
                 yield x
             buffer.append(None)
 
+        # default timestamps: the ones of the compressed points
+        times, owntimes = deque(), timestream is None
+        if owntimes:
+            timestream = iter(times.popleft, None)
+
         buffer = []
         bdata = databuffered(datastream, buffer)
         bL, bm, last_point = [], 0, None
@@ -169,35 +379,278 @@ class StreamCompressor():
 
         yield (last_point, (bL, bm))
 
+    # Compress and reconstruct a stream, passing each original point along with
+    # its reconstruction: one (n, m, pairs) per record, with n the number of
+    # points read when the record is output (+1 once the stream has ended, as
+    # in genplastream), m its weight and pairs its (original, reconstructed)
+    # points; original points never reconstructed come last, paired to None.
+    # Timestamps default to the ones of the compressed points, originals to
+    # the compressed points themselves.
+    def genplapairs(self, datastream, error, timestream=None,
+                    originalstream=None):
+        pending, times = deque(), deque()
+        read, owntimes = 0, timestream is None
+
+        def readpoints():
+            nonlocal read
+            if originalstream is not None:
+                for point, original in zip(datastream, originalstream):
+                    pending.append(original)
+                    if owntimes:
+                        times.append(point[0])
+                    read += 1
+                    yield point
+            else:
+                for point in datastream:
+                    pending.append(point)
+                    if owntimes:
+                        times.append(point[0])
+                    read += 1
+                    yield point
+            read += 1                               # end of stream
+
+        if owntimes:
+            timestream = iter(times.popleft, None)
+
+        for record in self.compress(readpoints(), error):
+            L, m = self.reconstruct(record, timestream)
+            yield read, m, [(pending.popleft(), point) for point in L]
+
+        if pending:
+            yield read, 0, [(original, None) for original in pending]
+
     def gendata(self, filename, error=1, axis=1):
-        with open(filename, 'r') as f:
-            yield from self.genplastream(stream(f, axis), error, streamtime(f))
+        yield from self.genplastream(streamfile(filename, axis), error,
+                                     streamtimefile(filename))
         
         
+### Quantization of the records
+
+FLOATCODES = {2: ('e', 'h'), 4: ('f', 'i')}    # float and same size int codes
+INTRANGE = {1: 1 << 7, 2: 1 << 15, 4: 1 << 31, 8: 1 << 63}
+SLACK = {2: 1/4, 4: 1/256}                      # error fraction kept for floats
+MANTISSA = {2: 10, 4: 23}                       # mantissa bits of the floats
+
+"""
+Quantized line a'x+b' of a line ax+b over the points x0..xn: coefficients are
+rounded in the frame of the C tools' records (local timestamps 1..n on the
+wire), the offset compensating for the rounding of the slope, and the closest
+of a few candidates is kept. Returns (a', b', deviation) where the deviation
+bounds |a'x+b' - ax-b| over [x0,xn].
+"""
+def quantizeline(a, b, x0, xn, slopes, offset):
+    c, u = b+a*(x0-1), xn-x0+1                  # local offset, last timestamp
+    best = None
+    for a1 in slopes(a):
+        c1 = offset(c-(a1-a)*(1+u)/2)
+        deviation = max(abs(a1-a+c1-c), abs((a1-a)*u+c1-c))
+        if best is None or deviation < best[2]:
+            best = (a1, c1, deviation)
+    a1, c1, deviation = best
+    return a1, c1-a1*(x0-1), deviation
+
+"""
+Floats of 2 or 4 bytes (float16, float32) for values (inputsize) and
+coefficients (outputsize) as stored by plabin; 8 bytes are kept as is.
+Segments get a slack: SLACK of the error or, for values of the given
+magnitude, the spacing of the coefficient floats there, at most half of the
+error; the compressor fits segments within the rest.
+"""
+class FloatQuantizer():
+    def __init__(self, inputsize=8, outputsize=8):
+        self.inputsize, self.outputsize = inputsize, outputsize
+
+    def slack(self, error, magnitude=0):
+        size = self.outputsize
+        if size not in FLOATCODES:
+            return 0
+        spacing = ldexp(1, frexp(magnitude)[1]-1-MANTISSA[size]) \
+                  if magnitude else 0
+        return min(max(error*SLACK[size], spacing), error/2)
+
+    def roundfloat(self, size, v):
+        code = FLOATCODES[size][0]
+        try:
+            return struct.unpack(code, struct.pack(code, v))[0]
+        except OverflowError:
+            raise ValueError("%r out of range of %d byte floats" % (v, size))
+
+    # v rounded and its two neighbouring floats
+    def roundfloats(self, size, v):
+        code, intcode = FLOATCODES[size]
+        bits = struct.unpack(intcode, struct.pack(code, self.roundfloat(size,
+                                                                        v)))[0]
+        for k in (bits, bits-1, bits+1):
+            try:
+                w = struct.unpack(code, struct.pack(intcode, k))[0]
+            except struct.error:
+                continue
+            if w == w and abs(w) != inf:
+                yield w
+
+    def value(self, y):
+        if self.inputsize not in FLOATCODES:
+            return y
+        return self.roundfloat(self.inputsize, y)
+
+    def line(self, a, b, x0, xn):
+        if self.outputsize not in FLOATCODES:
+            return a, b, 0
+        size = self.outputsize
+        return quantizeline(a, b, x0, xn, partial(self.roundfloats, size),
+                            partial(self.roundfloat, size))
+
+"""
+Scaled fixed point: values and line offsets are integers of inputsize and
+outputsize bytes counting steps, slopes count steps of 2*step/maxn, so that a
+quantized line deviates by at most step over maxn points; step is the slack
+"""
+class FixedQuantizer():
+    def __init__(self, step, maxn, inputsize=8, outputsize=8):
+        self.step, self.astep = step, 2*step/max(maxn, 1)
+        self.inputsize, self.outputsize = inputsize, outputsize
+
+    def slack(self, error, magnitude=0):
+        return self.step
+
+    def integer(self, v, step, size):
+        k = round(v/step)
+        if abs(k) >= INTRANGE[size]:
+            raise ValueError("%r out of range of %d byte fixed point" % (v,
+                                                                        size))
+        return k
+
+    def value(self, y):
+        return self.integer(y, self.step, self.inputsize)*self.step
+
+    def line(self, a, b, x0, xn):
+        astep, size = self.astep, self.outputsize
+        def slopes(a):
+            k = self.integer(a, astep, size)
+            return (k*astep, (k-1)*astep, (k+1)*astep)
+        return quantizeline(a, b, x0, xn, slopes,
+                            lambda c: self.integer(c, self.step, size)*self.step)
+
+    # records with integers instead of values and coefficients, and back
+    def tointegers(self, record, variant=False):
+        n, step, astep = record[0], self.step, self.astep
+        if n == 1 or (n < 0 and variant):
+            return (n,)+tuple(round(y/step) for y in record[1:])
+        if n > 1:
+            return (n, round(record[1]/astep), round(record[2]/step))
+        return (n, round(record[1]/step))
+
+    def fromintegers(self, record, variant=False):
+        n, step, astep = record[0], self.step, self.astep
+        if n == 1 or (n < 0 and variant):
+            return (n,)+tuple(k*step for k in record[1:])
+        if n > 1:
+            return (n, record[1]*astep, record[2]*step)
+        return (n, record[1]*step)
+
+"""
+Quantizer of a protocol: fixed point with step if given, else floats for the
+sizes of 2 or 4 bytes, else None (records of Python floats)
+"""
+def makequantizer(maxn, inputsize=8, outputsize=8, step=None):
+    if step is not None:
+        return FixedQuantizer(step, maxn, inputsize, outputsize)
+    if inputsize in FLOATCODES or outputsize in FLOATCODES:
+        return FloatQuantizer(inputsize, outputsize)
+    return None
+
 """
 Protocols: admits a maximum segment compression length and a weight for
-integer values
+integer values; values and coefficients are quantized to their sizes (see
+makequantizer). A latency bound forces the points held to be output at the
+latest upon the point read maxdelay points or maxtime (in timestamp units)
+after the oldest of them; as the protocols hold MINDELAY points before
+deciding on the first one, shorter bounds cannot be met.
 """
 class Protocol():
+    MINDELAY = 2
+
     # add minn here
-    def __init__(self, maxn, inputsize=8, outputsize=8, singletons=True):
+    def __init__(self, maxn, inputsize=8, outputsize=8, singletons=True,
+                 step=None, maxdelay=None, maxtime=None):
         self.maxn = maxn
         self.inputsize = inputsize # in bytes
         self.cntsize = int(ceil(maxn.bit_length() / 8)) # n in line segments
-        ## can use float here, 4 bytes only? then garentee breaks slightly
         self.coeffsize = outputsize # for (a,b)-coefficients in line segments
         self.singletons = singletons
+        self.quantizer = makequantizer(maxn, inputsize, outputsize, step)
+        self.maxdelay = inf if maxdelay is None else maxdelay
+        self.maxtime = inf if maxtime is None else maxtime
+        if self.maxdelay < self.MINDELAY:
+            raise ValueError("latency bound below %d points" % self.MINDELAY)
+        if self.maxtime <= 0:
+            raise ValueError("latency bound %g not positive" % self.maxtime)
+
+    def bounded(self):
+        return self.maxdelay < inf or self.maxtime < inf
 
     def cost(self, nbbytes):
         return nbbytes/self.inputsize
 
+    # error bound of the compressor under quantization for values up to
+    # magnitude, and the slack left
+    def tolerance(self, error, magnitude=0):
+        slack = self.quantizer.slack(error, magnitude)
+        if slack > 0 and slack >= error:
+            raise ValueError("quantization step %g not below the error %g" %
+                             (slack, error))
+        return error-slack, slack
+
+    # largest magnitude m of the values read, y included
+    def magnitude(self, y, m):
+        return abs(y) if m is None or abs(y) > m else m
+
+    # the closest value of inputsize bytes, beyond the error if none is within
+    def quantizevalue(self, y, error):
+        return self.quantizer.value(y)
+
+    # number of the points (x,y) kept within the error by the quantized line
+    # ax+b over them, and its coefficients: all if they deviate by at most
+    # the slack, else up to the first point beyond the error
+    def quantizeline(self, a, b, points, error, slack):
+        a, b, deviation = self.quantizer.line(a, b, points[0][0],
+                                              points[-1][0])
+        if deviation <= slack:
+            return len(points), a, b
+        k = next((i for i, (x, y) in enumerate(points)
+                  if not abs(a*x+b-y) <= error), len(points))
+        return k, a, b
+
+    # a segment ax+b over the points (x,y) quantized: records (k,a',b') of
+    # the longest prefixes their quantized line keeps within the error, each
+    # following one quantized again in its own frame, and (1,y') of the
+    # points left alone
+    def quantizesegment(self, a, b, points, error, slack):
+        records, i = [], 0
+        while i < len(points):
+            k = 0
+            if len(points)-i > 1:
+                k, a1, b1 = self.quantizeline(a, b, points[i:], error, slack)
+            if k > 1:
+                records.append((k, a1, b1))
+                i += k
+            else:
+                records.append((1, self.quantizevalue(points[i][1], error)))
+                i += 1
+        return records
+
 """
 Abstract Class: process a data stream of (x,y) tuples and generate a compressed stream
 of singleton point (y,) or approximation segments (x,n,a,b)
 """
 class TwoStreamsProtocol(Protocol):
-    
+    MINDELAY = 3
+
+    # singletons L (the first one at xL) are output alone, at no cost, when
+    # due before the segment
     def compress(self, streamCompressor, data):
+        maxn, maxdelay = min(self.maxn, self.maxdelay), self.maxdelay
+        maxtime = self.maxtime
         x0 = x1 = x2 = None                             # To handle <3 streams
         try:
             x0, y0 = next(data)
@@ -206,10 +659,18 @@ class TwoStreamsProtocol(Protocol):
             L = []
             
             while True:                                 # Initialization                
+                if L and (len(L)+2 >= maxdelay or x2 >= xL+maxtime):
+                    yield L, None
+                    L = []
                 streamCompressor.initialize(x0,y0,x1,y1)
 
-                if streamCompressor.check(x2,y2) :      # n >= 3 ?
+                if x2 >= x0+maxtime or streamCompressor.check(x2,y2) :
+                    if not L:                           # n >= 3 ?
+                        xL = x0
                     L.append(y0)
+                    if x2 >= x0+maxtime:
+                        yield L, None
+                        L = []
                     x0, y0 = x1, y1
                     x1, y1 = x2, y2
                     x2, y2 = next(data)
@@ -218,13 +679,27 @@ class TwoStreamsProtocol(Protocol):
                 streamCompressor.update(x2,y2)
                 
                 n = 3
+                limit = min(maxn, maxdelay-len(L))      # latency bound
+                due = (xL if L else x0)+maxtime
                 while True:                             # Line construction
                     x, y = next(data)
 
+                    if L and (n >= limit or x >= due) and n < maxn and \
+                       x < x0+maxtime:                  # singletons due
+                        yield L, None
+                        L = []
+                        limit, due = maxn, x0+maxtime
+
                     # Check if (x,y) within the limit slopes: terminate line ?
-                    if n >= self.maxn or streamCompressor.check(x,y) :
+                    if n >= limit or x >= due or streamCompressor.check(x,y) :
                         if self.singletons and n < 4 :  # Flush 1 isolated point
+                            late = n >= maxdelay-len(L) or x >= due
+                            if not L:
+                                xL = x0
                             L.append(y0)
+                            if late:
+                                yield L, None
+                                L = []
                             x0, y0 = x1, y1
                             x1, y1 = x2, y2
                             x2, y2 = x, y
@@ -270,6 +745,34 @@ class TwoStreamsProtocol(Protocol):
                 reconstructed.append((x,a*x+b))
                 
         return (reconstructed, m)
+
+    # a segment split by the quantization gives several records, the points
+    # left alone joining the singletons of the next one
+    def quantize(self, record, time, error, slack):
+        L, segment = record
+        values = []
+        for y in L:
+            next(time)
+            values.append(self.quantizevalue(y, error))
+        if segment is None:
+            return [(values, None)]
+        n, a, b = segment[1:]
+        points = [next(time) for _ in range(n)]
+        records, i = [], 0
+        for quantized in self.quantizesegment(a, b, points, error, slack):
+            if quantized[0] == 1:
+                values.append(quantized[1])
+            else:
+                records.append((values, (points[i][0],) + quantized))
+                values = []
+            i += quantized[0]
+        if values:
+            records.append((values, None))
+        return records
+
+    def feeder(self, streamCompressor):
+        from plafeed import TwoStreamsFeeder
+        return TwoStreamsFeeder(self, streamCompressor)
     
 """
 Abstract Class: process a data stream of (x,y) tuples and generate a compressed
@@ -281,19 +784,21 @@ class SingleStreamProtocol(Protocol):
         minpoints = int(ceil((self.coeffsize*2+self.cntsize) / self.inputsize))
         buffersize = minpoints-1
         pointbuffer = [None]*buffersize                 # To handle <min streams
+        maxn, maxtime = min(self.maxn, self.maxdelay), self.maxtime
         try:
             x0, y0 = next(data)
             x1, y1 = next(data)
             #for _ 
             while True:                                 # Initialization
                 n = 2
+                due = x0+maxtime                        # latency bound
                 streamCompressor.initialize(x0,y0,x1,y1)
                 
                 while True:                             # Line construction
                     x, y = next(data)
 
                     # Check if (x,y) is within the limit slopes: terminate line ?
-                    if n >= self.maxn or streamCompressor.check(x,y) :
+                    if n >= maxn or x >= due or streamCompressor.check(x,y) :
                         if self.singletons and n == 2 : # Flush 1 isolated point
                             yield (1, y0)
                             x0, y0 = x1, y1
@@ -330,9 +835,23 @@ class SingleStreamProtocol(Protocol):
             
         return (reconstructed, self.cost(self.cntsize + 2*self.coeffsize))
 
+    def quantize(self, record, time, error, slack):
+        if record[0] == 1:
+            next(time)
+            return [(1, self.quantizevalue(record[1], error))]
+        n, a, b = record
+        return self.quantizesegment(a, b, [next(time) for _ in range(n)],
+                                    error, slack)
+
+    def feeder(self, streamCompressor):
+        from plafeed import SingleStreamFeeder
+        return SingleStreamFeeder(self, streamCompressor)
+
 class SingleStreamLidarProtocol(Protocol):
     def compress(self, streamCompressor, data):
-        protocol = SingleStreamProtocol(self.maxn, self.inputsize)
+        protocol = SingleStreamProtocol(self.maxn, self.inputsize,
+                                        maxdelay=self.maxdelay,
+                                        maxtime=self.maxtime)
         for record in protocol.compress(streamCompressor, data):
             if record[0] > 1 and record[1] == 0:
                 yield (-record[0], record[2])
@@ -352,13 +871,36 @@ class SingleStreamLidarProtocol(Protocol):
             weight = self.cost(self.cntsize + 2*self.coeffsize)
             
         return ([(t,a*t+b) for t in (next(time) for _ in range(n))], weight)
+
+    # slopes quantized to 0 make horizontal segments
+    def quantize(self, record, time, error, slack):
+        if record[0] == 1:
+            next(time)
+            return [(1, self.quantizevalue(record[1], error))]
+        if record[0] < 0:
+            n, a, b = -record[0], 0, record[1]
+        else:
+            n, a, b = record
+        points = [next(time) for _ in range(n)]
+        return [(-r[0], r[2]) if r[0] > 1 and r[1] == 0 else r
+                for r in self.quantizesegment(a, b, points, error, slack)]
+
+    def feeder(self, streamCompressor):
+        from plafeed import SingleStreamLidarFeeder
+        return SingleStreamLidarFeeder(SingleStreamProtocol(self.maxn,
+                                       self.inputsize, maxdelay=self.maxdelay,
+                                       maxtime=self.maxtime), streamCompressor)
         
 """
 Abstract Class: process a data stream of (x,y) tuples and generate a compressed
 stream of singleton tuples (-m,y0,...,ym) or approx segment triplets (n,a,b)
 """
 class SingleStreamVariantProtocol(Protocol):
+    # the run of singletons L (the first one at xL) is output alone when due
+    # before the segment
     def compress(self, streamCompressor, data):
+        maxn, maxdelay = min(self.maxn, self.maxdelay), self.maxdelay
+        maxtime = self.maxtime
         x0 = x1 = None                                  # To handle <2 streams
         try:
             x0, y0 = next(data)
@@ -367,16 +909,27 @@ class SingleStreamVariantProtocol(Protocol):
             
             while True:                                 # Initialization
                 n = 2
+                limit = min(maxn, maxdelay-len(L))      # latency bound
+                due = (xL if L else x0)+maxtime
                 streamCompressor.initialize(x0,y0,x1,y1)
                 
                 while True:                             # Line construction
                     x, y = next(data)
 
+                    if L and (n >= limit or x >= due) and n < maxn and \
+                       x < x0+maxtime:                  # singletons due
+                        yield tuple([-len(L)]+L)
+                        L = []
+                        limit, due = maxn, x0+maxtime
+
                     # Check if (x,y) within the limit slopes: terminate line ?
-                    if n >= self.maxn or streamCompressor.check(x,y) :
+                    if n >= limit or x >= due or streamCompressor.check(x,y) :
                         if self.singletons and n == 2 : # Flush 1 isolated point
+                            late = n >= maxdelay-len(L) or x >= due
+                            if not L:
+                                xL = x0
                             L += [y0]
-                            if len(L) == self.maxn:
+                            if len(L) == self.maxn or late:
                                 yield tuple([-len(L)]+L)
                                 L = []
                             x0, y0 = x1, y1
@@ -421,3 +974,125 @@ class SingleStreamVariantProtocol(Protocol):
             reconstructed.append((x,a*x+b))
             
         return (reconstructed, self.cost(self.cntsize + 2*self.coeffsize))
+
+    # the points of a segment left alone by the quantization make runs
+    def quantize(self, record, time, error, slack):
+        if record[0] < 0:
+            values = [record[0]]
+            for y in record[1:]:
+                next(time)
+                values.append(self.quantizevalue(y, error))
+            return [tuple(values)]
+        n, a, b = record
+        records, points = [], [next(time) for _ in range(n)]
+        for r in self.quantizesegment(a, b, points, error, slack):
+            if r[0] > 1:
+                records.append(r)
+            elif records and -self.maxn < records[-1][0] < 0:
+                records[-1] = (records[-1][0]-1,) + records[-1][1:] + r[1:]
+            else:
+                records.append((-1,) + r[1:])
+        return records
+
+    def feeder(self, streamCompressor):
+        from plafeed import SingleStreamVariantFeeder
+        return SingleStreamVariantFeeder(self, streamCompressor)
+
+### Joint segmentation of several channels
+
+"""
+Compressor of the tuples (x,(y1,...,yk)) of several channels (see jointstream)
+with one compressor per channel and shared segment boundaries: a segment ends
+when any channel breaks its error bound, its coefficients being the tuples
+(a1,...,ak), (b1,...,bk) of the channels. The error is the tuple of the
+channels' errors, so that the protocols and StreamCompressor.compress/feeder
+drive it as a single channel compressor.
+"""
+class JointCompressor(StreamCompressor):
+    __slots__ = ('channels',)
+
+    def __init__(self, channels, bound=255):
+        self.channels = channels
+        self.bound = bound
+
+    @property
+    def error(self):
+        return tuple(channel.error for channel in self.channels)
+
+    @error.setter
+    def error(self, errors):
+        for channel, error in zip(self.channels, errors):
+            channel.error = error
+
+    def initialize(self,x0,y0,x1,y1):
+        for channel, u, v in zip(self.channels, y0, y1):
+            channel.initialize(x0,u,x1,v)
+
+    def check(self,x,y):
+        return any(channel.check(x,v) for channel, v in zip(self.channels, y))
+
+    def update(self,x,y):
+        for channel, v in zip(self.channels, y):
+            channel.update(x,v)
+
+    def flush(self):
+        a, b = zip(*(channel.flush() for channel in self.channels))
+        return a, b
+
+"""
+Single stream protocol of the tuples of a JointCompressor: records (1,Y) of
+an isolated tuple Y and (n,A,B) of a segment shared by the channels, A and B
+the tuples of their coefficients; a segment costs one counter for all the
+channels. Errors and slacks are tuples too.
+"""
+class JointProtocol(SingleStreamProtocol):
+    def __init__(self, channels, maxn, inputsize=8, outputsize=8,
+                 singletons=True, step=None, maxdelay=None, maxtime=None):
+        super().__init__(maxn, inputsize, outputsize, singletons, step,
+                         maxdelay, maxtime)
+        self.channels = channels
+
+    def tolerance(self, errors, magnitudes=None):
+        tolerances = [Protocol.tolerance(self, error, m) for error, m in
+                      zip(errors, magnitudes or [0]*len(errors))]
+        return tuple(zip(*tolerances))
+
+    def magnitude(self, y, m):
+        return tuple(Protocol.magnitude(self, v, u) for v, u in
+                     zip(y, m or [None]*len(y)))
+
+    def reconstruct(self, record, time):
+        k = self.channels
+        if record[0] == 1:
+            x = next(time)
+            return ([(x,record[1])], self.cost(self.cntsize+k*self.inputsize))
+
+        n, A, B = record
+        reconstructed = []
+
+        for i in range(n):
+            x = next(time)
+            reconstructed.append((x,tuple(a*x+b for a, b in zip(A, B))))
+
+        return (reconstructed, self.cost(self.cntsize + 2*k*self.coeffsize))
+
+    def quantizevalue(self, Y, errors):
+        return tuple(Protocol.quantizevalue(self, y, error)
+                     for y, error in zip(Y, errors))
+
+    # the prefix kept within the errors by the lines of all the channels
+    def quantizeline(self, A, B, points, errors, slacks):
+        lines = [Protocol.quantizeline(self, a, b, [(x, Y[i]) for x, Y in
+                                                    points], error, slack)
+                 for i, (a, b, error, slack) in enumerate(zip(A, B, errors,
+                                                               slacks))]
+        k, A, B = zip(*lines)
+        return min(k), A, B
+
+    def quantize(self, record, time, errors, slacks):
+        if record[0] == 1:
+            next(time)
+            return [(1, self.quantizevalue(record[1], errors))]
+        n, A, B = record
+        return self.quantizesegment(A, B, [next(time) for _ in range(n)],
+                                    errors, slacks)
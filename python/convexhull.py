@@ -3,57 +3,113 @@
 # Last modified 09/2018
 
 from compressor import *
-from bisect import bisect_left as binsearch
 
 ### Convex Hull utils
 
-class ProjectedList():
-    def __init__(self, convexhull, x):
-        self.list = convexhull.hull
-        self.d = convexhull.d
-        self.axis = x
+MAX_HULL = 16                                   # initial hull capacity
+
+"""
+Convex hull of error endpoints stored in preallocated coordinate arrays: the
+live vertices are xs[head:tail], ys[head:tail]; trimming the head or the tail
+only moves these indices, the arrays being compacted (or doubled) when the
+tail reaches their end
+"""
+class ConvexHull():
+    __slots__ = ('xs', 'ys', 'd', 'head', 'tail')
 
-    def __len__(self):
-        return len(self.list)-1
-    
-    def __getitem__(self, i):
-        return self.d*intersect(self.axis, self.list[i], self.list[i+1])
-    
-class ConvexHull():        
     def __init__(self, x0, y0, x1, y1, error, up):
-        self.d = -1 if up else 1
-        self.hull = [(x0,y0+self.d*error), (x1,y1+self.d*error)]
+        self.xs = [0.0]*MAX_HULL
+        self.ys = [0.0]*MAX_HULL
+        self.reset(x0, y0, x1, y1, error, up)
+
+    def reset(self, x0, y0, x1, y1, error, up):
+        self.d = d = -1 if up else 1
+        self.xs[0], self.ys[0] = x0, y0+d*error
+        self.xs[1], self.ys[1] = x1, y1+d*error
+        self.head, self.tail = 0, 2
+
+    def __len__(self):
+        return self.tail-self.head
+
+    # snapshots (see compressor.snapshot) keep the live vertices only
+    def __getstate__(self):
+        return (self.xs[self.head:self.tail], self.ys[self.head:self.tail],
+                self.d)
+
+    def __setstate__(self, state):
+        xs, ys, self.d = state
+        n = len(xs)
+        capacity = max(MAX_HULL, 2*n)
+        self.xs = xs+[0.0]*(capacity-n)
+        self.ys = ys+[0.0]*(capacity-n)
+        self.head, self.tail = 0, n
 
     def __getitem__(self, i):
-        return self.hull[i]
+        return (self.xs[self.head+i], self.ys[self.head+i])
 
+    # bisect_left of y over the hull edges projected on x, as an offset from
+    # the head: d*intersect(x, vertex k, vertex k+1) for each edge k
     def index(self, x, y):
-        return binsearch(ProjectedList(self, x), y*self.d)
+        xs, ys, d = self.xs, self.ys, self.d
+        y, lo, hi = y*d, self.head, self.tail-1
+        while lo < hi:
+            mid = (lo+hi)//2
+            x0, y0, x1, y1 = xs[mid], ys[mid], xs[mid+1], ys[mid+1]
+            if d*(((y1-y0)*x+x1*y0-y1*x0)/(x1-x0)) < y:
+                lo = mid+1
+            else:
+                hi = mid
+        return lo-self.head
     
     def update_head(self,x,y):
         i = self.index(x, y)
         if i != 0:
-            y0 = intersect(self.hull[0][0], self.hull[i], (x,y))
-            self.hull[:i] = [(self.hull[0][0],y0)]
+            xs, ys, k = self.xs, self.ys, self.head+i
+            y0 = intersect(xs[self.head], (xs[k],ys[k]), (x,y))
+            xs[k-1], ys[k-1] = xs[self.head], y0
+            self.head = k-1
 
     def update_tail(self,x,y):
-        self.hull[self.index(x, y)+1:] = [(x,y)]
+        tail = self.head+self.index(x, y)+1
+        if tail == len(self.xs):                # compact, double if full
+            n = tail-self.head
+            if n > len(self.xs)//2:
+                self.xs.extend([0.0]*len(self.xs))
+                self.ys.extend([0.0]*len(self.ys))
+            self.xs[:n] = self.xs[self.head:tail]
+            self.ys[:n] = self.ys[self.head:tail]
+            self.head, tail = 0, n
+        self.xs[tail], self.ys[tail] = x, y
+        self.tail = tail+1
 
 """
 Process a data stream of (x,y) tuples and generate a compressed stream by
 maintaining two convex hulls (lower and upper) of the error endpoints
 """
 class ConvexhullCompressor(StreamCompressor):
+    __slots__ = ('ymin', 'ymax', 't', 'newymin', 'newymax', 'lowerhull',
+                 'upperhull')
+
     def initialize(self,x0,y0,x1,y1):
         self.ymin, self.ymax, self.t = y1-self.error, y1+self.error, x1
-        self.lowerhull = ConvexHull(x0,y0,x1,y1,self.error,up=True)
-        self.upperhull = ConvexHull(x0,y0,x1,y1,self.error,up=False)
+        if hasattr(self, 'lowerhull'):          # reuse the hulls' arrays
+            self.lowerhull.reset(x0,y0,x1,y1,self.error,up=True)
+            self.upperhull.reset(x0,y0,x1,y1,self.error,up=False)
+        else:
+            self.lowerhull = ConvexHull(x0,y0,x1,y1,self.error,up=True)
+            self.upperhull = ConvexHull(x0,y0,x1,y1,self.error,up=False)
 
     def check(self,x,y):
-        self.newymin = intersect(x, self.upperhull[0], (self.t,self.ymin))
-        self.newymax = intersect(x, self.lowerhull[0], (self.t,self.ymax))
+        upper, lower = self.upperhull, self.lowerhull
+        self.newymin = intersect(x, (upper.xs[upper.head],
+                                     upper.ys[upper.head]), (self.t,self.ymin))
+        self.newymax = intersect(x, (lower.xs[lower.head],
+                                     lower.ys[lower.head]), (self.t,self.ymax))
         return y-self.error > self.newymax or y+self.error < self.newymin
 
+    def hullsize(self):
+        return len(self.lowerhull)+len(self.upperhull)
+
     def flush(self):
         ystart = (self.lowerhull[0][1]+self.upperhull[0][1])/2
         yend = (self.ymin+self.ymax)/2
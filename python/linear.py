@@ -2,15 +2,97 @@
 # Linear Regression Compressor, Romaric Duvignau, duvignau@chalmers.se, 2018
 # Last modified 09/2018
 
+from itertools import chain, count, islice
+
 from compressor import *
+import linearnative
 
 DELTA = 0.0000000001
 
+HULLSCAN = 16                                   # hulls scanned linearly
+
+# protocols of the C core: single stream records, then regrouped
+NATIVE = (SingleStreamProtocol, SingleStreamLidarProtocol,
+          SingleStreamVariantProtocol)
+
+"""
+Test if the line a*x+b passes above a vertex of uhull (the lower convex hull
+of the upper error endpoints) or below a vertex of lhull (the upper convex
+hull of the lower endpoints). The hulls are convex from their second vertex
+on only, update never removing it: vertex 0 is always tested and the farthest
+of the others is where their edge slopes cross a, found by binary search as
+in ConvexHull.index, its neighbours being also tested against rounding. Small
+hulls are simply scanned.
+"""
+def above(hull, a, b):
+    if len(hull) > HULLSCAN:
+        lo, hi = 1, len(hull)-1                 # first edge with slope >= a
+        while lo < hi:
+            mid = (lo+hi)//2
+            (x0,y0), (x1,y1) = hull[mid], hull[mid+1]
+            if y1-y0 < a*(x1-x0):
+                lo = mid+1
+            else:
+                hi = mid
+        hull = [hull[0]] + hull[max(lo-1,1):lo+2]
+
+    for x, y in hull:
+        if a*x+b > y+0.0000000001:
+            return True
+    return False
+
+def below(hull, a, b):
+    if len(hull) > HULLSCAN:
+        lo, hi = 1, len(hull)-1                 # first edge with slope <= a
+        while lo < hi:
+            mid = (lo+hi)//2
+            (x0,y0), (x1,y1) = hull[mid], hull[mid+1]
+            if y1-y0 > a*(x1-x0):
+                lo = mid+1
+            else:
+                hi = mid
+        hull = [hull[0]] + hull[max(lo-1,1):lo+2]
+
+    for x, y in hull:
+        if a*x+b < y-0.0000000001:
+            return True
+    return False
+
+"""
+Single stream records as Lidar (horizontal segments (-n,b)) and Variant (runs
+of singletons (-m,y1,...,ym)) records
+"""
+def lidarrecords(records):
+    for record in records:
+        if record[0] > 1 and record[1] == 0:
+            yield (-record[0], record[2])
+        else:
+            yield record
+
+def variantrecords(records, maxn):
+    L = []
+    for record in records:
+        if record[0] == 1:
+            L.append(record[1])
+            if len(L) == maxn:
+                yield tuple([-len(L)]+L)
+                L = []
+        else:
+            if L:
+                yield tuple([-len(L)]+L)
+                L = []
+            yield record
+    if L:
+        yield tuple([-len(L)]+L)
+
 """
 Process a data stream of (x,y) tuples and generate a compressed stream by
 computing the best-fit line and test if all errors are within the threshold
 """
 class LinearCompressor(StreamCompressor):
+    __slots__ = ('sumx', 'sumy', 'sumx2', 'sumxy', 'n', 'a', 'b', 'newa',
+                 'newb', 'uhull', 'lhull')
+
     def initialize(self,x0,y0,x1,y1):
         self.sumx = x0+x1
         self.sumy = y0+y1
@@ -35,20 +117,67 @@ class LinearCompressor(StreamCompressor):
         if not (y-self.error-0.0000000001 <= x*self.newa+self.newb <= y+self.error+0.0000000001):
             return True
         
-        # Linear checking for now, nothing smarter
-        for x, y in self.uhull:
-            if self.newa*x+self.newb > y+0.0000000001:
-                return True
-            
-        for x, y in self.lhull:
-            if self.newa*x+self.newb < y-0.0000000001:
-                return True
-
-        return False
+        return above(self.uhull, self.newa, self.newb) or \
+               below(self.lhull, self.newa, self.newb)
 
     def flush(self):
         return self.a, self.b
 
+    def hullsize(self):
+        return len(self.uhull)+len(self.lhull)
+
+    # Whole buffers at logical timestamps: compressed by the C core when it is
+    # built (see linearnative.py) under a single stream protocol without
+    # quantization or latency bound, else point by point; the records are the
+    # same
+    def native(self):
+        return linearnative.LIBRARY is not None and \
+               type(self.protocol) in NATIVE and \
+               self.protocol.quantizer is None and not self.protocol.bounded()
+
+    def compressarray(self, ys, error):
+        if not self.native():
+            yield from self.compress(zip(count(1), ys), error)
+            return
+        chunks = (ys[i:i+linearnative.BLOCKSIZE]
+                  for i in range(0, len(ys), linearnative.BLOCKSIZE))
+        yield from self.compressvalues(chunks, error)
+
+    def compressblocks(self, data, error, blocksize=linearnative.BLOCKSIZE):
+        data = iter(data)
+        block = list(islice(data, blocksize))
+        logical = lambda block, x: isinstance(x, int) and \
+                  [p[0] for p in block] == list(range(x, x+len(block)))
+
+        if not self.native() or not block or not logical(block, block[0][0]):
+            yield from self.compress(chain(block, data), error)
+            return
+
+        def chunks(block, x):
+            while block:
+                if not logical(block, x):
+                    raise ValueError("timestamps are not logical ones")
+                yield [y for (_,y) in block]
+                x += len(block)
+                block = list(islice(data, blocksize))
+
+        yield from self.compressvalues(chunks(block, block[0][0]), error,
+                                       block[0][0])
+
+    def compressvalues(self, chunks, error, x0=1):
+        self.error = error
+        protocol = self.protocol
+        if type(protocol) is SingleStreamLidarProtocol:
+            yield from lidarrecords(linearnative.compresschunks(
+                chunks, error, protocol.maxn, True, x0))
+            return
+
+        records = linearnative.compresschunks(chunks, error, protocol.maxn,
+                                              protocol.singletons, x0)
+        if type(protocol) is SingleStreamVariantProtocol:
+            records = variantrecords(records, protocol.maxn)
+        yield from records
+
     def update(self,x,y):
         self.a, self.b = self.newa, self.newb
 
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# Linear Native, ctypes binding of the C core of the Linear compressor
+# Last modified 10/2026
+
+import ctypes
+import subprocess
+from array import array
+from os import environ, getpid, replace
+from os.path import dirname, join, abspath, exists, getmtime
+from sys import stderr
+
+BLOCKSIZE = 65536                               # values per call
+LIBRARY_NAME = "liblinearpla.so"
+SOURCE = join(dirname(abspath(__file__)), "..", "C", "linear-pla-lib.c")
+BUILD = ["gcc", "-std=gnu99", "-O2", "-ffp-contract=off", "-shared", "-fPIC"]
+
+"""
+Compile the library at path from SOURCE if it is missing or older than its
+source (the build command of its header), writing it aside first so that
+processes importing it meanwhile load either library whole; False if it
+cannot be built, with a warning if a stale library is left
+"""
+def buildlibrary(path):
+    if exists(path) and getmtime(path) >= getmtime(SOURCE):
+        return True
+    built = "%s.%d" % (path, getpid())
+    try:
+        subprocess.run(BUILD + [SOURCE, "-o", built], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        replace(built, path)
+        return True
+    except (OSError, subprocess.CalledProcessError):
+        if exists(path):
+            print("warning:", path, "is older than", SOURCE, "and could not "
+                  "be rebuilt: the native Linear backend is off", file=stderr)
+        return False
+
+"""
+Load C/linear-pla-lib.c compiled as a shared library (see its header): from
+the path in PLA_LINEAR_LIB, as is, or next to its source, built or rebuilt
+when needed; None if not available
+"""
+def loadlibrary():
+    path = environ.get("PLA_LINEAR_LIB")
+    if path is None:
+        path = join(dirname(SOURCE), LIBRARY_NAME)
+        if not exists(SOURCE) or not buildlibrary(path):
+            return None
+    try:
+        library = ctypes.CDLL(path)
+    except OSError:
+        return None
+
+    library.linear_pla.restype = ctypes.c_long
+    library.linear_pla.argtypes = [
+        ctypes.c_void_p, ctypes.c_long, ctypes.c_long, ctypes.c_double,
+        ctypes.c_long, ctypes.c_int, ctypes.c_int, ctypes.c_void_p,
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(ctypes.c_long)]
+    return library
+
+LIBRARY = loadlibrary()
+
+"""
+Compress a buffer of values (array of doubles) at logical timestamps x0,
+x0+1,... in one call: returns the single stream records (n,a,b) / (1,y) and
+the index of the first value not compressed yet (the open segment's first
+value, len(values) if final)
+"""
+def nativerecords(values, x0, error, maxn, singletons, final):
+    n = len(values)
+    counts = array('l', bytes(n*array('l').itemsize))
+    a = array('d', bytes(8*n))
+    b = array('d', bytes(8*n))
+    consumed = ctypes.c_long()
+
+    k = LIBRARY.linear_pla(values.buffer_info()[0], n, x0, error, maxn,
+                           singletons, final, counts.buffer_info()[0],
+                           a.buffer_info()[0], b.buffer_info()[0],
+                           ctypes.byref(consumed))
+    if k < 0:
+        raise MemoryError("linear_pla could not allocate its hulls")
+
+    records = [(1, ai) if ni == 1 else (ni, ai, bi) for ni, ai, bi in
+               zip(counts[:k].tolist(), a[:k].tolist(), b[:k].tolist())]
+    return records, consumed.value
+
+"""
+Single stream records of chunks of values (iterables of floats) at logical
+timestamps from x0 on; the values of the segment left open by a call are
+compressed again with the next chunk
+"""
+def compresschunks(chunks, error, maxn, singletons, x0=1):
+    pending = array('d')
+    for chunk in chunks:
+        pending.extend(chunk)
+        if len(pending) < BLOCKSIZE:
+            continue
+        records, consumed = nativerecords(pending, x0, error, maxn,
+                                          singletons, False)
+        yield from records
+        pending, x0 = pending[consumed:], x0+consumed
+
+    if pending:
+        yield from nativerecords(pending, x0, error, maxn, singletons, True)[0]
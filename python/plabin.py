@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# Binary PLA records, layout of the C tools (C/linear-pla.c, C/pla-decompress.c)
+# Last modified 10/2026
+
+import struct
+
+from compressor import *
+
+BUFFERSIZE = 1 << 16                            # bytes per write/read
+
+COUNTS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+VALUES = {2: 'e', 4: 'f', 8: 'd'}
+INTEGERS = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}     # fixed point values
+
+"""
+Packed record layout of a single stream protocol: a counter of cntsize bytes
+followed by the value (singleton, inputsize bytes), the two coefficients
+(segment, coeffsize bytes each), one coefficient (Lidar horizontal segment) or
+the m values of a run of singletons (Variant); native byte order as fwrite.
+With the default C parameters (-b 255 -t 4 -o 4) records are the C ones.
+The Lidar and Variant counters are signed, wide enough for -maxn to maxn (2
+bytes for -b 255). Under a fixed point quantizer, values and coefficients are
+its integers.
+"""
+class RecordFormat():
+    def __init__(self, protocol):
+        if isinstance(protocol, TwoStreamsProtocol):
+            raise ValueError("no binary layout for the two streams protocol")
+        if protocol.cntsize not in COUNTS:
+            raise ValueError("no binary counter of %d bytes" % protocol.cntsize)
+        self.fixed = protocol.quantizer \
+                     if isinstance(protocol.quantizer, FixedQuantizer) else None
+        values = VALUES if self.fixed is None else INTEGERS
+        for size in (protocol.inputsize, protocol.coeffsize):
+            if size not in values:
+                raise ValueError("no binary %s of %d bytes" % (
+                    "float" if self.fixed is None else "integer", size))
+
+        # negative counters: Lidar horizontal segments, Variant singletons
+        if isinstance(protocol, (SingleStreamLidarProtocol,
+                                 SingleStreamVariantProtocol)):
+            size = next((size for size in sorted(INTEGERS)
+                         if protocol.maxn < 1 << 8*size-1), None)
+            if size is None:
+                raise ValueError("no binary counter for %d points"
+                                 % protocol.maxn)
+            cnt = INTEGERS[size]
+        else:
+            cnt = COUNTS[protocol.cntsize]
+        self.cnt = struct.Struct('=' + cnt)
+        self.value = struct.Struct('=' + values[protocol.inputsize])
+        self.coeff = struct.Struct('=' + values[protocol.coeffsize])
+        self.variant = isinstance(protocol, SingleStreamVariantProtocol)
+
+        self.singleton = struct.Struct(self.cnt.format + self.value.format[1:])
+        self.segment = struct.Struct(self.cnt.format + 2*self.coeff.format[1:])
+        self.horizontal = struct.Struct(self.cnt.format+self.coeff.format[1:])
+
+    def pack(self, record):
+        if self.fixed is not None:
+            record = self.fixed.tointegers(record, self.variant)
+        n = record[0]
+        if n == 1:
+            return self.singleton.pack(n, record[1])
+        if n > 1:
+            return self.segment.pack(n, record[1], record[2])
+        if self.variant:
+            return self.cnt.pack(n) + \
+                   struct.pack('=%d%s' % (-n, self.value.format[1:]), *record[1:])
+        return self.horizontal.pack(n, record[1])
+
+    def unpack(self, buffer, offset):
+        """(record, new offset) or (None, offset) if buffer ends too early"""
+        if offset+self.cnt.size > len(buffer):
+            return None, offset
+        n, = self.cnt.unpack_from(buffer, offset)
+
+        if n == 1:
+            S = self.singleton
+        elif n > 1:
+            S = self.segment
+        elif self.variant:
+            S = struct.Struct(self.cnt.format + (-n)*self.value.format[1:])
+        else:
+            S = self.horizontal
+
+        if offset+S.size > len(buffer):
+            return None, offset
+        record = S.unpack_from(buffer, offset)
+        if self.fixed is not None:
+            record = self.fixed.fromintegers(record, self.variant)
+        return record, offset+S.size
+
+"""
+Shift segment coefficients between absolute logical timestamps (Python
+records) and the C tools' timestamps restarting at 1 on each segment; x is
+the timestamp of the first record's first point
+"""
+def localrecords(records, sign=1, x=1):
+    for record in records:
+        n = record[0]
+        if n > 1:
+            a, b = record[1], record[2]
+            record = (n, a, b+sign*a*(x-1))
+        x += abs(n)
+        yield record
+
+def globalrecords(records):
+    yield from localrecords(records, -1)
+
+"""
+Write records packed to a binary file object with buffered bulk writes; with
+local set, segments are rebased to the C tools' timestamps
+"""
+def writerecords(f, records, protocol, local=False, buffersize=BUFFERSIZE):
+    form = RecordFormat(protocol)
+    buffer = bytearray()
+    n = 0
+
+    for record in localrecords(records) if local else records:
+        buffer += form.pack(record)
+        n += 1
+        if len(buffer) >= buffersize:
+            f.write(buffer)
+            buffer.clear()
+
+    f.write(buffer)
+    return n
+
+def writerecordfile(filename, records, protocol, local=False):
+    with open(filename, "wb") as f:
+        return writerecords(f, records, protocol, local)
+
+"""
+Stream records back from a binary file object read by blocks
+"""
+def readrecords(f, protocol, local=False, buffersize=BUFFERSIZE):
+    def unpacked():
+        form = RecordFormat(protocol)
+        buffer = b''
+
+        while True:
+            block = f.read(buffersize)
+            if not block:
+                break
+            buffer += block
+            offset = 0
+            while True:
+                record, offset = form.unpack(buffer, offset)
+                if record is None:
+                    break
+                yield record
+            buffer = buffer[offset:]
+
+        if buffer:
+            raise ValueError("truncated record of %d bytes" % len(buffer))
+
+    yield from globalrecords(unpacked()) if local else unpacked()
+
+def readrecordfile(filename, protocol, local=False):
+    with open(filename, "rb") as f:
+        yield from readrecords(f, protocol, local)
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# PLA Blocks, entropy coded blocks of binary PLA records
+# Last modified 10/2026
+
+import lzma
+import struct
+import zlib
+from itertools import accumulate, chain
+from operator import xor
+from array import array
+
+from compressor import *
+from plabin import BUFFERSIZE, VALUES, RecordFormat, localrecords
+from segmentstore import protocolkind
+
+BLOCKRECORDS = 1024                             # records per block
+MAGIC = b'PLAZ'
+HEADER = struct.Struct('<4sBBBBIQI')            # magic, kind, codec, sizes,
+                                                # records, first x, payload
+CODECS = {'none': 0, 'zlib': 1, 'lzma': 2}
+WORDS = {2: 'H', 4: 'I', 8: 'Q'}                # float bits as integers
+
+"""
+Zigzag varints (LEB128 of 2|i| or 2|i|-1 for negative i) of integers
+"""
+def varints(ints):
+    out = bytearray()
+    for i in ints:
+        u = i << 1 if i >= 0 else (-i << 1) - 1
+        while u >= 0x80:
+            out.append(u & 0x7f | 0x80)
+            u >>= 7
+        out.append(u)
+    return out
+
+"""
+k integers decoded from the varints of data at offset: (list, new offset)
+"""
+def readvarints(data, offset, k):
+    ints = []
+    for _ in range(k):
+        u = shift = 0
+        while True:
+            byte = data[offset]
+            offset += 1
+            u |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        ints.append(u >> 1 if not u & 1 else -((u+1) >> 1))
+    return ints, offset
+
+"""
+Column of floats of size bytes: the bits of each value XORed with the previous
+one (slowly drifting values share their sign, exponent and first mantissa
+bits, which become zero bytes), then shuffled into byte planes so that the
+zeros are contiguous for the compressor; XOR being bytewise, the byte order of
+the words does not matter
+"""
+def floatcolumn(values, size):
+    words = array(WORDS[size], struct.pack('<%d%s' % (len(values),
+                                                      VALUES[size]), *values))
+    words = array(words.typecode, map(xor, words, chain((0,), words)))
+    raw = words.tobytes()
+    return b''.join(raw[k::size] for k in range(size))
+
+def readfloatcolumn(data, offset, k, size):
+    raw = bytearray(k*size)
+    for plane in range(size):
+        raw[plane::size] = data[offset+plane*k:offset+(plane+1)*k]
+    words = array(WORDS[size], bytes(raw))
+    words = array(words.typecode, accumulate(words, xor))
+    values = struct.unpack('<%d%s' % (k, VALUES[size]), words.tobytes())
+    return list(values), offset+k*size
+
+"""
+Column of fixed point integers: zigzag varints of their differences
+"""
+def integercolumn(values):
+    return varints(map(int.__sub__, values, chain((0,), values)))
+
+def readintegercolumn(data, offset, k):
+    deltas, offset = readvarints(data, offset, k)
+    return list(accumulate(deltas)), offset
+
+"""
+Encoder of the records of a single stream protocol into independent blocks:
+a header (kind, codec, value and coefficient sizes, number of records, logical
+timestamp of the first point, payload size) followed by the payload compressed
+by the codec. Before compression the payload holds the counts as zigzag
+varints of their differences, then the slopes, the offsets and the singleton
+values in columns, floats XORed with their predecessor (floatcolumn) and fixed
+point integers as differences (integercolumn). Coefficients are those of the
+binary records (local timestamps, see plabin) so offsets drift with the
+values. points, bytes and rawbytes count the points of the records, the bytes
+of the blocks and those of the binary records.
+"""
+class BlockEncoder():
+    def __init__(self, protocol, codec='zlib', blockrecords=BLOCKRECORDS,
+                 level=None):
+        self.form = RecordFormat(protocol)
+        self.kind = protocolkind(protocol)
+        self.codec = CODECS[codec]
+        self.inputsize, self.coeffsize = protocol.inputsize, protocol.coeffsize
+        self.blockrecords = blockrecords
+        self.level = level
+        self.records = []
+        self.x = 1                              # first point of the block
+        self.points = self.blocks = self.bytes = self.rawbytes = 0
+
+    # the encoded block when blockrecords records are pending, else b''
+    def add(self, record):
+        self.records.append(record)
+        self.points += abs(record[0])
+        if len(self.records) >= self.blockrecords:
+            return self.flush()
+        return b''
+
+    def extend(self, records):
+        return b''.join(self.add(record) for record in records)
+
+    def flush(self):
+        if not self.records:
+            return b''
+        block = self.encode(self.records, self.x)
+        self.records, self.x = [], self.points+1
+        return block
+
+    def compress(self, payload):
+        if self.codec == CODECS['zlib']:
+            return zlib.compress(payload, 6 if self.level is None
+                                 else self.level)
+        if self.codec == CODECS['lzma']:
+            return lzma.compress(payload, lzma.FORMAT_ALONE,
+                                 preset=6 if self.level is None else self.level)
+        return bytes(payload)
+
+    def encode(self, records, x):
+        form, fixed = self.form, self.form.fixed
+        counts, a, b, values = [], [], [], []
+
+        for record in localrecords(records, x=x):
+            self.rawbytes += len(form.pack(record))
+            if fixed is not None:
+                record = fixed.tointegers(record, form.variant)
+            n = record[0]
+            counts.append(n)
+            if n > 1:
+                a.append(record[1])
+                b.append(record[2])
+            elif n == 1 or form.variant:
+                values.extend(record[1:])
+            else:                               # Lidar horizontal segment
+                b.append(record[1])
+
+        payload = integercolumn(counts)
+        if fixed is not None:
+            payload += integercolumn(a) + integercolumn(b) \
+                       + integercolumn(values)
+        else:
+            payload += floatcolumn(a, self.coeffsize) \
+                       + floatcolumn(b, self.coeffsize) \
+                       + floatcolumn(values, self.inputsize)
+
+        payload = self.compress(payload)
+        block = HEADER.pack(MAGIC, self.kind, self.codec, self.inputsize,
+                            self.coeffsize, len(records), x, len(payload))
+        self.blocks += 1
+        self.bytes += len(block)+len(payload)
+        return block+payload
+
+"""
+Records of the block at offset of data, decoded alone with the protocol that
+wrote it: (records, new offset), or (None, offset) if data ends too early
+"""
+def decodeblock(data, offset, protocol):
+    if offset+HEADER.size > len(data):
+        return None, offset
+    magic, kind, codec, inputsize, coeffsize, k, x, size = \
+        HEADER.unpack_from(data, offset)
+    if magic != MAGIC:
+        raise ValueError("not a PLA block at offset %d" % offset)
+    if kind != protocolkind(protocol) or inputsize != protocol.inputsize \
+       or coeffsize != protocol.coeffsize:
+        raise ValueError("block written under another protocol")
+    start = offset+HEADER.size
+    if start+size > len(data):
+        return None, offset
+
+    payload = bytes(data[start:start+size])
+    if codec == CODECS['zlib']:
+        payload = zlib.decompress(payload)
+    elif codec == CODECS['lzma']:
+        payload = lzma.decompress(payload, lzma.FORMAT_ALONE)
+    elif codec != CODECS['none']:
+        raise ValueError("unknown block codec %d" % codec)
+
+    form = RecordFormat(protocol)
+    fixed = form.fixed
+    counts, i = readintegercolumn(payload, 0, k)
+    nsegments = sum(1 for n in counts if n > 1)
+    nvalues = sum(1 if n == 1 else -n for n in counts
+                  if n == 1 or (n < 1 and form.variant))
+    noffsets = sum(1 for n in counts if n > 1 or (n < 1 and not form.variant))
+
+    if fixed is not None:
+        a, i = readintegercolumn(payload, i, nsegments)
+        b, i = readintegercolumn(payload, i, noffsets)
+        values, i = readintegercolumn(payload, i, nvalues)
+    else:
+        a, i = readfloatcolumn(payload, i, nsegments, coeffsize)
+        b, i = readfloatcolumn(payload, i, noffsets, coeffsize)
+        values, i = readfloatcolumn(payload, i, nvalues, inputsize)
+
+    a, b, values, records = iter(a), iter(b), iter(values), []
+    for n in counts:
+        if n > 1:
+            record = (n, next(a), next(b))
+        elif n == 1:
+            record = (1, next(values))
+        elif form.variant:
+            record = tuple(chain((n,), (next(values) for _ in range(-n))))
+        else:
+            record = (n, next(b))
+        if fixed is not None:
+            record = fixed.fromintegers(record, form.variant)
+        records.append(record)
+
+    return list(localrecords(records, -1, x)), start+size
+
+"""
+Write records as blocks to a binary file object; returns the encoder, whose
+counters give the sizes written
+"""
+def writeblocks(f, records, protocol, codec='zlib', blockrecords=BLOCKRECORDS,
+                level=None):
+    encoder = BlockEncoder(protocol, codec, blockrecords, level)
+    for record in records:
+        block = encoder.add(record)
+        if block:
+            f.write(block)
+    f.write(encoder.flush())
+    return encoder
+
+def writeblockfile(filename, records, protocol, codec='zlib',
+                   blockrecords=BLOCKRECORDS, level=None):
+    with open(filename, "wb") as f:
+        return writeblocks(f, records, protocol, codec, blockrecords, level)
+
+"""
+Stream records back from a binary file object of blocks
+"""
+def readblocks(f, protocol, buffersize=BUFFERSIZE):
+    buffer = b''
+    while True:
+        chunk = f.read(buffersize)
+        if not chunk:
+            break
+        buffer += chunk
+        offset = 0
+        while True:
+            records, offset = decodeblock(buffer, offset, protocol)
+            if records is None:
+                break
+            yield from records
+        buffer = buffer[offset:]
+
+    if buffer:
+        raise ValueError("truncated block of %d bytes" % len(buffer))
+
+def readblockfile(filename, protocol):
+    with open(filename, "rb") as f:
+        yield from readblocks(f, protocol)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# PLA Decompress, vectorized batch reconstruction of PLA records (needs NumPy)
+# Last modified 10/2026
+
+import argparse
+from sys import stdout
+
+import numpy as np
+
+from compressor import *
+from segmentstore import SegmentStore
+
+"""
+Reconstruct a batch of records, a SegmentStore or records of the given
+protocol, at once: every point gets the a,b of its record repeated and is
+evaluated as a*x+b over the whole timestamp array, then the singleton values
+are put in place. Timestamps default to the logical ones start, start+1,...
+Values are written into out if given (an array with room for all points).
+Returns the arrays of timestamps and values.
+"""
+def decompress(records, protocol=None, times=None, out=None, start=1):
+    store = records if isinstance(records, SegmentStore) \
+            else SegmentStore(protocol, records)
+
+    offsets = np.frombuffer(store.offsets, dtype=np.int64)
+    npoints = int(offsets[-1])
+    points = np.diff(offsets)
+
+    if times is None:
+        times = np.arange(start, start+npoints, dtype=np.float64)
+    else:
+        times = np.asarray(times, dtype=np.float64)
+        if len(times) < npoints:
+            raise ValueError("given timestream exhausted!")
+        times = times[:npoints]
+
+    values = np.empty(npoints) if out is None else out[:npoints]
+    np.multiply(np.repeat(np.frombuffer(store.a), points), times, out=values)
+    values += np.repeat(np.frombuffer(store.b), points)
+
+    # singletons come first in their record (the only points of single
+    # stream singleton records, L of two streams records)
+    if len(store.values):
+        voffsets = np.frombuffer(store.voffsets, dtype=np.int64)
+        first = np.repeat(offsets[:-1], points)
+        singleton = np.arange(npoints)-first < np.repeat(np.diff(voffsets),
+                                                         points)
+        values[singleton] = np.frombuffer(store.values)
+
+    return times, values
+
+"""
+Records printed by plastats -x, one per line: n,a,b or n,y (n,b for Lidar
+horizontal segments)
+"""
+def readzip(f, sep=','):
+    for line in f:
+        fields = line.strip().split(sep)
+        if not fields[0]:
+            continue
+        n = int(fields[0])
+        if n > 1:
+            yield (n, float(fields[1]), float(fields[2]))
+        else:
+            yield tuple([n]+[float(y) for y in fields[1:]])
+
+"""
+Records of a file written by plastats -x, as text, with -B in binary or with
+-B -Z in coded blocks
+"""
+def readzipfile(filename, protocol, binary=False, sep=',', blocks=False):
+    if blocks:
+        from plablocks import readblockfile
+        yield from readblockfile(filename, protocol)
+    elif binary:
+        from plabin import readrecordfile
+        yield from readrecordfile(filename, protocol, local=True)
+    else:
+        with open(filename, "r") as f:
+            yield from readzip(f, sep)
+
+def decompressfile(filename, protocol, binary=False, sep=',', times=None,
+                   blocks=False):
+    store = SegmentStore(protocol, readzipfile(filename, protocol, binary, sep,
+                                               blocks))
+    return decompress(store, times=times)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="""
+                Decompress PLA records output by plastats -x (text or -B
+                binary) and print the reconstructed values, one per line.""")
+    parser.add_argument("target", help="records file")
+
+    protocolgroup = parser.add_mutually_exclusive_group()
+    protocolgroup.add_argument("-II", "--singlestreamv", action="store_true",
+                        help="set single stream variant protocol")
+    protocolgroup.add_argument("-III", "--lidarvariant", action="store_true",
+                        help="set single stream lidar variant protocol")
+
+    parser.add_argument("-B", "--binary", action="store_true",
+                        help="read binary records (plastats -x -B)")
+    parser.add_argument("-Z", "--blocks", action="store_true",
+                        help="read coded blocks of records (plastats -x -B -Z)")
+    parser.add_argument("-b", "--bnd", default=255, type=int,
+                        help="segment length bound; default=255")
+    parser.add_argument("-t", "--inputsize", default=8, type=int,
+                        help="input size in bytes; default=8")
+    parser.add_argument("-o", "--outputsize", default=8, type=int,
+                        help="output size in bytes (for alpha/beta); default=8")
+    parser.add_argument("-P", "--precision", type=float, metavar="STEP",
+                        help="fixed point records with this step (plastats -P)")
+    parser.add_argument("-f", "--floats", action="store_true",
+                        help="""write values as binary floats of inputsize
+                        bytes (as C/pla-decompress 1)""")
+    parser.add_argument("-T", "--times", action="store_true",
+                        help="print logical timestamps with the values")
+    parser.add_argument("-s", "--sep", default=',',
+                        help="set records and output column sep; default=','")
+
+    args = parser.parse_args()
+
+    if args.singlestreamv:
+        protocol = SingleStreamVariantProtocol
+    elif args.lidarvariant:
+        protocol = SingleStreamLidarProtocol
+    else:
+        protocol = SingleStreamProtocol
+    protocol = protocol(args.bnd, args.inputsize, args.outputsize,
+                        step=args.precision)
+
+    times, values = decompressfile(args.target, protocol, args.binary,
+                                   args.sep, blocks=args.blocks)
+
+    if args.floats:
+        dtype = {2: np.float16, 4: np.float32, 8: np.float64}[args.inputsize]
+        stdout.buffer.write(values.astype(dtype).tobytes())
+    elif args.times:
+        stdout.writelines("%s%s%r\n" % (x, args.sep, y) for x, y in
+                          zip(times.astype(np.int64).tolist(), values.tolist()))
+    else:
+        stdout.writelines("%r\n" % y for y in values.tolist())
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# PLA Feeders, push interface of the protocols and checkpoints of open streams
+# Last modified 10/2026
+
+from collections import deque
+from os import replace
+import pickle
+
+EMPTY, ONE, TWO, LINE = range(4)                # points held / line open
+
+"""
+Push interface of the single stream protocol, SingleStreamProtocol.compress
+as an explicit state machine driven by the caller: feed(x,y) returns the list
+of records completed by the point (mostly empty) and close() the last ones,
+the records being the same as compress'. State is kept in slots so that
+many streams can be held open at once.
+"""
+class SingleStreamFeeder():
+    __slots__ = ('compressor', 'maxn', 'singletons', 'state', 'n',
+                 'x0', 'y0', 'x1', 'y1', 'maxdelay', 'maxtime', 'limit',
+                 'due')
+
+    def __init__(self, protocol, streamCompressor):
+        self.compressor = streamCompressor
+        self.maxn, self.singletons = protocol.maxn, protocol.singletons
+        self.maxdelay, self.maxtime = protocol.maxdelay, protocol.maxtime
+        self.state = EMPTY
+
+    # latency bound of the line started at x0: its length and due timestamp
+    def bound(self):
+        self.limit = min(self.maxn, self.maxdelay)
+        self.due = self.x0+self.maxtime
+
+    # the points held are due upon the point at x (latency bound)
+    def late(self, x):
+        return self.n >= self.maxdelay or x >= self.due
+
+    # isolated point, flushed before its time if due
+    def singleton(self, y, due):
+        return [(1, y)]
+
+    def segment(self, n, a, b):
+        return [(n, a, b)]
+
+    def end(self):
+        return []
+
+    def feed(self, x, y):
+        if self.state == LINE:
+            compressor = self.compressor
+            if self.n >= self.limit or x >= self.due or compressor.check(x,y) :
+                if self.singletons and self.n == 2 : # Flush 1 isolated point
+                    records = self.singleton(self.y0, self.late(x))
+                    self.x0, self.y0 = self.x1, self.y1
+                    self.x1, self.y1 = x, y
+                    compressor.initialize(self.x0, self.y0, x, y)
+                    self.bound()
+                    return records
+
+                a, b = compressor.flush()           # Flush one segment
+                records = self.segment(self.n, a, b)
+                self.x0, self.y0, self.state = x, y, ONE
+                return records
+
+            compressor.update(x,y)
+            self.n += 1
+            return []
+
+        if self.state == ONE:                       # Initialization
+            self.x1, self.y1 = x, y
+            self.n, self.state = 2, LINE
+            self.compressor.initialize(self.x0, self.y0, x, y)
+            self.bound()
+        else:
+            self.x0, self.y0, self.state = x, y, ONE
+        return []
+
+    def close(self):
+        state, self.state = self.state, EMPTY
+        if state == LINE:
+            a, b = self.compressor.flush()
+            return self.segment(self.n, a, b)
+        if state == ONE:
+            return self.singleton(self.y0, False) + self.end()
+        return self.end()
+
+"""
+Lidar variant: horizontal segments as (-n,b); as SingleStreamLidarProtocol,
+singletons are always on
+"""
+class SingleStreamLidarFeeder(SingleStreamFeeder):
+    __slots__ = ()
+
+    def __init__(self, protocol, streamCompressor):
+        super().__init__(protocol, streamCompressor)
+        self.singletons = True
+
+    def segment(self, n, a, b):
+        return [(-n, b)] if a == 0 else [(n, a, b)]
+
+"""
+Variant: isolated points are grouped in runs (-m,y1,...,ym) of at most maxn
+"""
+class SingleStreamVariantFeeder(SingleStreamFeeder):
+    __slots__ = ('L', 'xL')
+
+    def __init__(self, protocol, streamCompressor):
+        super().__init__(protocol, streamCompressor)
+        self.L = []
+
+    # the run held (from xL) is due before the line
+    def bound(self):
+        super().bound()
+        if self.L:
+            self.limit = min(self.limit, self.maxdelay-len(self.L))
+            self.due = self.xL+self.maxtime
+
+    def feed(self, x, y):
+        if self.L and (self.n >= self.limit or x >= self.due) and \
+           self.n < min(self.maxn, self.maxdelay) and \
+           x < self.x0+self.maxtime:                # singletons due
+            records = self.end()
+            self.bound()
+            return records + super().feed(x, y)
+        return super().feed(x, y)
+
+    def late(self, x):
+        return self.n >= self.maxdelay-len(self.L) or x >= self.due
+
+    def singleton(self, y, due):
+        if not self.L:
+            self.xL = self.x0
+        self.L.append(y)
+        if len(self.L) == self.maxn or due:
+            return self.end()
+        return []
+
+    def segment(self, n, a, b):
+        return self.end() + [(n, a, b)]
+
+    def end(self):
+        if not self.L:
+            return []
+        records, self.L = [tuple([-len(self.L)]+self.L)], []
+        return records
+
+"""
+Push interface of the two streams protocol (TwoStreamsProtocol.compress):
+records (L, segment) hold the singletons met before a segment
+"""
+class TwoStreamsFeeder():
+    __slots__ = ('compressor', 'maxn', 'singletons', 'state', 'n', 'L',
+                 'x0', 'y0', 'x1', 'y1', 'x2', 'y2', 'maxdelay', 'maxtime',
+                 'limit', 'due', 'xL')
+
+    def __init__(self, protocol, streamCompressor):
+        self.compressor = streamCompressor
+        self.maxn, self.singletons = protocol.maxn, protocol.singletons
+        self.maxdelay, self.maxtime = protocol.maxdelay, protocol.maxtime
+        self.state, self.L = EMPTY, []
+
+    # singletons held from xL, output alone when due
+    def hold(self, y, due):
+        if not self.L:
+            self.xL = self.x0
+        self.L.append(y)
+        if due:
+            records, self.L = [(self.L, None)], []
+            return records
+        return []
+
+    # first line through the 3 points held, else shift out a singleton
+    def start(self):
+        records = []
+        if self.L and (len(self.L)+2 >= self.maxdelay or
+                       self.x2 >= self.xL+self.maxtime):
+            records, self.L = [(self.L, None)], []
+
+        compressor = self.compressor
+        compressor.initialize(self.x0, self.y0, self.x1, self.y1)
+        late = self.x2 >= self.x0+self.maxtime
+        if late or compressor.check(self.x2, self.y2) : # n >= 3 ?
+            records += self.hold(self.y0, late)
+            self.x0, self.y0 = self.x1, self.y1
+            self.x1, self.y1 = self.x2, self.y2
+            self.state = TWO
+        else:
+            compressor.update(self.x2, self.y2)
+            self.n, self.state = 3, LINE
+            self.limit = min(self.maxn, self.maxdelay-len(self.L))
+            self.due = (self.xL if self.L else self.x0)+self.maxtime
+        return records
+
+    def feed(self, x, y):
+        state = self.state
+        if state == LINE:
+            compressor = self.compressor
+            records = []
+            maxn = min(self.maxn, self.maxdelay)
+            if self.L and (self.n >= self.limit or x >= self.due) and \
+               self.n < maxn and x < self.x0+self.maxtime: # singletons due
+                records, self.L = [(self.L, None)], []
+                self.limit, self.due = maxn, self.x0+self.maxtime
+
+            if self.n >= self.limit or x >= self.due or compressor.check(x,y) :
+                if self.singletons and self.n < 4 : # Flush 1 isolated point
+                    records += self.hold(self.y0, self.n >= self.maxdelay -
+                                         len(self.L) or x >= self.due)
+                    self.x0, self.y0 = self.x1, self.y1
+                    self.x1, self.y1 = self.x2, self.y2
+                    self.x2, self.y2 = x, y
+                    return records + self.start()
+
+                a, b = compressor.flush()           # Flush one segment
+                records.append((self.L, (self.x0, self.n, a, b)))
+                self.L = []
+                self.x0, self.y0, self.state = x, y, ONE
+                return records
+
+            compressor.update(x,y)
+            self.n += 1
+            return records
+        elif state == TWO:
+            self.x2, self.y2 = x, y
+            return self.start()
+        elif state == ONE:
+            self.x1, self.y1, self.state = x, y, TWO
+        else:
+            self.x0, self.y0, self.state = x, y, ONE
+        return []
+
+    def close(self):
+        state, self.state = self.state, EMPTY
+        L, self.L = self.L, []
+        if state == ONE:
+            return [(L+[self.y0], None)]
+        if state == TWO:
+            return [(L+[self.y0, self.y1], None)]
+        if state == LINE:
+            if self.n < 4:
+                return [(L+[self.y0, self.y1, self.y2], None)]
+            a, b = self.compressor.flush()
+            return [(L, (self.x0, self.n, a, b))]
+        return []
+
+"""
+Push interface with quantization: the records of the feeder are quantized as
+StreamCompressor.compress does, against the points fed
+"""
+class QuantizedFeeder():
+    __slots__ = ('protocol', 'feeder', 'points', 'error', 'slack',
+                 'magnitude')
+
+    def __init__(self, protocol, feeder, error, slack):
+        self.protocol, self.feeder = protocol, feeder
+        self.points, self.error, self.slack = deque(), error, slack
+        self.magnitude = None
+
+    def quantize(self, records):
+        time = iter(self.points.popleft, None)
+        return [quantized for record in records for quantized in
+                self.protocol.quantize(record, time, self.error, self.slack)]
+
+    def feed(self, x, y):
+        self.points.append((x, y))
+        m = self.protocol.magnitude(y, self.magnitude)
+        if m != self.magnitude:
+            self.magnitude = m
+            self.feeder.compressor.error = \
+                self.protocol.tolerance(self.error, m)[0]
+        records = self.feeder.feed(x, y)
+        return self.quantize(records) if records else records
+
+    def close(self):
+        return self.quantize(self.feeder.close())
+
+### Checkpoints of the push interface
+
+"""
+Snapshot of an open stream: its feeder with the protocol state (points held,
+pending singletons) and the compressor's segment state (sums, hulls, angles).
+resume(snapshot) gives back a feeder to be fed from the next point on, with
+the same records as if the stream had not been interrupted. Snapshots are
+pickles: only resume trusted ones.
+"""
+def snapshot(feeder):
+    return pickle.dumps(feeder, pickle.HIGHEST_PROTOCOL)
+
+def resume(data):
+    return pickle.loads(data)
+
+"""
+Save the snapshots of many streams, a dict of feeders by stream key, at once;
+the file is replaced atomically so that a crash leaves the previous one
+"""
+def savesnapshots(feeders, filename):
+    with open(filename+".tmp", "wb") as f:
+        pickle.dump({key: snapshot(feeder) for key, feeder in feeders.items()},
+                    f, pickle.HIGHEST_PROTOCOL)
+    replace(filename+".tmp", filename)
+
+def loadsnapshots(filename):
+    with open(filename, "rb") as f:
+        return {key: resume(data) for key, data in pickle.load(f).items()}
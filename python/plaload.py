@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# PLA Load, stand-in sensors for plaserver.py (as C/example_data/csv2socket.py)
+# Last modified 10/2026
+
+import argparse
+import asyncio
+import struct
+import time
+from math import sin, nan
+from random import Random
+
+from compressor import *
+
+FLOATS = {2: 'e', 4: 'f', 8: 'd'}
+
+"""
+Values of a stand-in sensor: a noisy sine wave, different for each sensor
+"""
+def gensensor(i, n):
+    rand = Random(i)
+    period, noise = rand.uniform(50, 500), rand.uniform(0, 0.1)
+    for x in range(n):
+        yield sin(x/period) + rand.uniform(-noise, noise)
+
+"""
+Send the values to host:port as packed floats followed by NaN, by batches of
+batch values, at most rate values per second if given
+"""
+async def sensor(values, host, port, size=4, batch=256, rate=None):
+    code = '=%d' + FLOATS[size]
+    reader, writer = await asyncio.open_connection(host, port)
+    start, sent = time.perf_counter(), 0
+
+    values = list(values) + [nan]
+    for i in range(0, len(values), batch):
+        chunk = values[i:i+batch]
+        writer.write(struct.pack(code % len(chunk), *chunk))
+        await writer.drain()                    # server backpressure
+        sent += len(chunk)
+        if rate:
+            ahead = sent/rate - (time.perf_counter()-start)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+
+    writer.close()
+    await writer.wait_closed()
+    return sent-1
+
+async def load(gensensors, host, port, size, batch, rate):
+    start = time.perf_counter()
+    sent = await asyncio.gather(*(sensor(values, host, port, size, batch, rate)
+                                  for values in gensensors))
+    return sum(sent), time.perf_counter()-start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="""
+                Open many concurrent sensor connections to plaserver.py, each
+                sending a noisy sine wave or the values of a file.""")
+    parser.add_argument("-n", "--streams", default=100, type=int,
+                        help="number of concurrent sensors; default=100")
+    parser.add_argument("-N", "--points", default=10000, type=int,
+                        help="values sent by each sensor; default=10000")
+    parser.add_argument("-f", "--file",
+                        help="send the values of channel 0 of this file instead")
+    parser.add_argument("-r", "--rate", type=float,
+                        help="values per second of each sensor; default=as fast as possible")
+    parser.add_argument("-t", "--inputsize", default=4, type=int,
+                        help="size in bytes of the floats sent; default=4")
+    parser.add_argument("-B", "--batch", default=256, type=int,
+                        help="values sent at once; default=256")
+    parser.add_argument("-H", "--host", default="localhost",
+                        help="server address; default=localhost")
+    parser.add_argument("-p", "--port", default=12345, type=int,
+                        help="server port; default=12345")
+
+    args = parser.parse_args()
+
+    if args.file:
+        values = [y for (x,y) in streamfile(args.file, 0)][:args.points]
+        gensensors = [values]*args.streams
+    else:
+        gensensors = [gensensor(i, args.points) for i in range(args.streams)]
+
+    sent, elapsed = asyncio.run(load(gensensors, args.host, args.port,
+                                     args.inputsize, args.batch, args.rate))
+    print(args.streams, "streams", sent, "values", "%.2fs" % elapsed,
+          "%.0f values/s" % (sent/elapsed))
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# PLA Profile, call counters and stage timers of instrumented compressors
+# Last modified 10/2026
+
+from collections import defaultdict
+from itertools import count
+from time import perf_counter
+
+"""
+Counters and stage timers of a profiled run (see profiled): calls of the
+compressor's methods, hull sizes after each update, records output (singleton
+values, segments and their lengths) and the time spent in each stage, every
+second being counted in the innermost stage running
+"""
+class Profile():
+    def __init__(self, stage='stats'):
+        self.calls = defaultdict(int)
+        self.times = defaultdict(float)
+        self.lengths = defaultdict(int)         # segment length histogram
+        self.singletons = self.horizontals = 0
+        self.hulls = self.hullsum = self.hullmax = 0
+        self.stage, self.mark = stage, perf_counter()
+
+    def switch(self, stage):
+        now = perf_counter()
+        self.times[self.stage] += now-self.mark
+        previous, self.stage, self.mark = self.stage, stage, now
+        return previous
+
+    def timed(self, iterable, stage):
+        iterator = iter(iterable)
+        while True:
+            previous = self.switch(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.switch(previous)
+            yield item
+
+    def hull(self, size):
+        self.hulls += 1
+        self.hullsum += size
+        self.hullmax = max(self.hullmax, size)
+
+    def record(self, record):
+        if isinstance(record[0], list):         # two streams (L, segment)
+            L, segment = record
+            self.singletons += len(L)
+            if segment is not None:
+                self.lengths[segment[1]] += 1
+            return
+
+        n = record[0]
+        if n == 1:
+            self.singletons += 1
+        elif n > 1:
+            self.lengths[n] += 1
+        elif len(record) == 1-n:                # variant run of singletons
+            self.singletons += -n
+        else:                                   # lidar horizontal segment
+            self.horizontals += 1
+            self.lengths[-n] += 1
+
+    def results(self):
+        self.switch(self.stage)
+        return {'calls': dict(self.calls), 'seconds': dict(self.times),
+                'singletons': self.singletons,
+                'segments': sum(self.lengths.values()),
+                'horizontal segments': self.horizontals,
+                'segment lengths': dict(sorted(self.lengths.items())),
+                'hull size': {'mean': self.hullsum/self.hulls if self.hulls
+                              else 0, 'max': self.hullmax}}
+
+    def report(self, file=None):
+        results = self.results()
+        total = sum(results['seconds'].values()) or 1
+        lines = ["Stage       |   Seconds|  Share"]
+        for stage, t in sorted(results['seconds'].items(), key=lambda s: -s[1]):
+            lines.append('{:12}'.format(stage) + "|" + '{:10.3f}'.format(t)
+                         + "|" + '{:6.1f}%'.format(100*t/total))
+        lines.append("Calls: " + ", ".join("%s %d" % call for call in
+                                           sorted(results['calls'].items())))
+        lines.append("Records: %d singleton values, %d segments"
+                     % (results['singletons'], results['segments'])
+                     + (" (%d horizontal)" % self.horizontals
+                        if self.horizontals else ""))
+
+        buckets = defaultdict(int)              # lengths by powers of 2
+        for n, k in self.lengths.items():
+            buckets[n.bit_length()] += k
+        lines.append("Segment lengths: " + ", ".join(
+            "%d-%d: %d" % (1 << b-1, (1 << b)-1, buckets[b])
+            for b in sorted(buckets)))
+        if self.hulls:
+            lines.append("Hull size: mean %.1f, max %d"
+                         % (results['hull size']['mean'], self.hullmax))
+        print("\n".join(lines), file=file)
+
+"""
+Compressor methods counting their calls into the class' profile and timing
+themselves as stages; mixed in by profiled
+"""
+class ProfiledCompressor():
+    __slots__ = ()
+
+    def initialize(self,x0,y0,x1,y1):
+        profile = self.profile
+        profile.calls['initialize'] += 1
+        previous = profile.switch('initialize')
+        super().initialize(x0,y0,x1,y1)
+        profile.switch(previous)
+
+    def check(self,x,y):
+        profile = self.profile
+        profile.calls['check'] += 1
+        previous = profile.switch('check')
+        result = super().check(x,y)
+        profile.switch(previous)
+        return result
+
+    def update(self,x,y):
+        profile = self.profile
+        profile.calls['update'] += 1
+        previous = profile.switch('update')
+        super().update(x,y)
+        profile.switch(previous)
+        if hasattr(self, 'hullsize'):
+            profile.hull(self.hullsize())
+
+    def flush(self):
+        self.profile.calls['flush'] += 1
+        return super().flush()
+
+    def reconstruct(self, record, timestream):
+        profile = self.profile
+        profile.calls['reconstruct'] += 1
+        previous = profile.switch('reconstruct')
+        try:
+            return super().reconstruct(record, timestream)
+        finally:
+            profile.switch(previous)
+
+    def compress(self, data, error):
+        profile = self.profile
+        for record in profile.timed(super().compress(profile.timed(data,
+                                    'parse'), error), 'compress'):
+            profile.record(record)
+            yield record
+
+    # whole buffers too are compressed point by point, as the native and
+    # block engines would bypass the methods counted
+    def compressarray(self, ys, error):
+        return self.compress(zip(count(1), ys), error)
+
+    def compressblocks(self, data, error):
+        return self.compress(data, error)
+
+"""
+Instrument a compressor in place for the given profile: its class is swapped
+for a subclass with ProfiledCompressor's methods, so that compressors not
+profiled run their own code untouched
+"""
+def profiled(compressor, profile):
+    cls = type(compressor)
+    compressor.__class__ = type(cls.__name__, (ProfiledCompressor, cls),
+                                {'__slots__': (), 'profile': profile})
+    return compressor
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# PLA Server, asyncio ingestion of many sensor streams over TCP
+# Last modified 10/2026
+
+import argparse
+import asyncio
+import struct
+from itertools import count
+from os import makedirs
+from os.path import join
+from importlib import import_module
+from sys import stderr
+
+from compressor import *
+from plabin import RecordFormat, localrecords
+from plastats import METHODS
+
+CHUNKSIZE = 1 << 14                             # bytes read at once
+QUEUESIZE = 16                                  # record lists queued per stream
+FLOATS = {2: 'e', 4: 'f', 8: 'd'}
+
+"""
+Records of a stream to a file, packed as the C tools' records (with local
+timestamps, see plabin) or printed as plastats -x
+"""
+class FileSink():
+    def __init__(self, filename, protocol, binary=True, sep=','):
+        self.form = RecordFormat(protocol) if binary else None
+        self.f = open(filename, "wb" if binary else "w")
+        self.sep = sep
+        self.x = 1                              # next logical timestamp
+
+    def write(self, records):
+        if self.form is not None:
+            self.f.write(b''.join(self.form.pack(record) for record in
+                                  localrecords(records, x=self.x)))
+            self.x += sum(abs(record[0]) for record in records)
+        else:
+            self.f.writelines(self.sep.join(str(v) for v in record) + "\n"
+                              for record in records)
+
+    def close(self):
+        self.f.close()
+
+"""
+Push values to the feeder with the logical timestamps following n, up to the
+first NaN: the records they complete and the number of values before the NaN
+(None without one). Runs in an executor thread, off the event loop.
+"""
+def feedvalues(feeder, n, values):
+    records = []
+    for i, y in enumerate(values):
+        if y != y:
+            return records, i
+        records += feeder.feed(n+i+1, y)
+    return records, None
+
+"""
+Compress the values of a connection, packed floats of size bytes in native
+byte order as C/example_data/csv2socket.py sends them, until a NaN or the end
+of the connection, with logical timestamps. Values are pushed to the feeder
+chunk by chunk in the loop's default executor and the records completed by a
+chunk are queued in outq (None ends the stream): a full queue stops the
+reads, hence the sender. Returns the number of values.
+"""
+async def readvalues(reader, size, feeder, outq):
+    loop = asyncio.get_running_loop()
+    code, rest, n = FLOATS[size], b'', 0
+
+    while True:
+        block = await reader.read(CHUNKSIZE)
+        if not block:
+            break
+        block = rest + block
+        k = len(block)//size
+        values = struct.unpack('=%d%s' % (k, code), block[:k*size])
+        rest = block[k*size:]
+
+        records, end = await loop.run_in_executor(None, feedvalues, feeder, n,
+                                                  values)
+        n += k if end is None else end
+        if records:
+            await outq.put(records)
+        if end is not None:
+            break
+    await outq.put(await loop.run_in_executor(None, feeder.close))
+    await outq.put(None)
+    return n
+
+"""
+Write the queued records to the sink, in the loop's default executor, until
+None. Returns the number of records.
+"""
+async def writerecords(outq, sink):
+    loop = asyncio.get_running_loop()
+    n = 0
+    while True:
+        records = await outq.get()
+        if records is None:
+            return n
+        await loop.run_in_executor(None, sink.write, records)
+        n += len(records)
+
+"""
+Accept sensor connections and compress each one with its own compressor;
+stops after maxstreams connections if given
+"""
+async def serve(makecompressor, makeprotocol, error, makesink, host, port,
+                maxstreams=None, verbose=False):
+    ids = count(1)
+    done = asyncio.Event()
+    served = 0
+
+    async def handle(reader, writer):
+        nonlocal served
+        loop = asyncio.get_running_loop()
+        sid = next(ids)
+        outq = asyncio.Queue(QUEUESIZE)
+        compressor = makecompressor()
+        compressor.setprotocol(makeprotocol())
+        sink = await loop.run_in_executor(None, makesink, sid)
+
+        reading = asyncio.create_task(readvalues(
+                      reader, compressor.protocol.inputsize,
+                      compressor.feeder(error), outq))
+        writing = asyncio.create_task(writerecords(outq, sink))
+        try:
+            npoints, nrecords = await asyncio.gather(reading, writing)
+            if verbose:
+                print("stream", sid, writer.get_extra_info('peername'),
+                      npoints, "points", nrecords, "records", file=stderr)
+        finally:
+            # after a failure, the reads stop (a failed writer would leave
+            # them waiting on the queue) and the writer ends with the queue:
+            # it is not cancelled, so no write runs when the sink is closed
+            reading.cancel()
+            await asyncio.gather(reading, return_exceptions=True)
+            if not writing.done():
+                await outq.put(None)
+            await asyncio.gather(writing, return_exceptions=True)
+            await loop.run_in_executor(None, sink.close)
+            writer.close()
+            served += 1
+            if maxstreams is not None and served >= maxstreams:
+                done.set()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        if verbose:
+            print("listening on", host, port, file=stderr)
+        if maxstreams is None:
+            await server.serve_forever()
+        else:
+            await done.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="""
+                Compress sensor streams sent over TCP as packed floats ending
+                with NaN, one compressor per connection, records written to a
+                file per stream.""")
+    parser.add_argument("error", type=float,
+                        help="maximum tolerated error for PLA compression")
+    parser.add_argument("-M", "--method", default="linear", choices=METHODS,
+                        help="compression method; default=linear")
+
+    protocolgroup = parser.add_mutually_exclusive_group()
+    protocolgroup.add_argument("-I", "--twostream", action="store_true",
+                        help="set 2 streams protocol (text records only)")
+    protocolgroup.add_argument("-II", "--singlestreamv", action="store_true",
+                        help="set single stream variant protocol")
+    protocolgroup.add_argument("-III", "--lidarvariant", action="store_true",
+                        help="set single stream lidar variant protocol")
+
+    parser.add_argument("-b", "--bnd", default=255, type=int,
+                        help="segment length bound; default=255")
+    parser.add_argument("-t", "--inputsize", default=4, type=int,
+                        help="""size in bytes of the floats received;
+                        default=4 (C float)""")
+    parser.add_argument("-o", "--outputsize", default=4, type=int,
+                        help="""output size in bytes (for alpha/beta);
+                        default=4, the layout of C/pla-decompress""")
+    parser.add_argument("-P", "--precision", type=float, metavar="STEP",
+                        help="fixed point records with this step (plastats -P)")
+    parser.add_argument("-k", "--maxdelay", type=int, metavar="POINTS",
+                        help="""latency bound in points (plastats -k): records
+                        are written at the latest POINTS points after their
+                        first point""")
+    parser.add_argument("-T", "--text", action="store_true",
+                        help="""write text records as plastats -x instead of
+                        binary ones""")
+    parser.add_argument("-d", "--directory", default=".",
+                        help="directory of the per stream record files")
+    parser.add_argument("-H", "--host", default="localhost",
+                        help="listening address; default=localhost")
+    parser.add_argument("-p", "--port", default=12345, type=int,
+                        help="listening port; default=12345")
+    parser.add_argument("-n", "--streams", type=int,
+                        help="stop after this number of streams")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="report each stream on stderr")
+
+    args = parser.parse_args()
+
+    if args.twostream:
+        protocol = TwoStreamsProtocol
+    elif args.singlestreamv:
+        protocol = SingleStreamVariantProtocol
+    elif args.lidarvariant:
+        protocol = SingleStreamLidarProtocol
+    else:
+        protocol = SingleStreamProtocol
+
+    def makeprotocol():
+        return protocol(args.bnd, args.inputsize, args.outputsize,
+                        step=args.precision, maxdelay=args.maxdelay)
+
+    module, maker = METHODS[args.method]
+    makecompressor = getattr(import_module(module), maker)
+    binary = not args.text and not args.twostream
+
+    makedirs(args.directory, exist_ok=True)
+    def makesink(sid):
+        filename = join(args.directory, "stream%d.%s" % (sid,
+                                                         "pla" if binary else "txt"))
+        return FileSink(filename, makeprotocol(), binary)
+
+    try:
+        asyncio.run(serve(makecompressor, makeprotocol, args.error, makesink,
+                          args.host, args.port, args.streams, args.verbose))
+    except KeyboardInterrupt:
+        pass
@@ -4,181 +4,598 @@
 
 ## cleaning update -- June 2020
 
+import json
 import struct
-from math import sqrt
+from math import sqrt, fsum, inf
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from heapq import heappop, heapreplace
+from itertools import tee
 import argparse
 from os import listdir
-from os.path import isdir, join
-from sys import argv
+from os.path import isdir, join, basename, splitext
+from importlib import import_module
+from sys import argv, stdout, stderr
+from time import monotonic, time
 
 from compressor import *
+from plaprofile import Profile, profiled
 from platk import *
 
 DELTA = 0.0001
+FLUSHRECORDS = 64                       # records summed before exact sums
 
 #def approximatets(compressor, filename, errors):
 
-def plastats(originalstream, gendatastream, maxerror, deltatime,
-             verbose=False, sep=","):
-    nb_original = errors = merror = sumerror2 = nb_values = 0
-    n = delays = discarded = 0
-        
-    #try:
-    for (point,R) in gendatastream:
-        #print(point,R)
-        n += 1
-        if R is not None:
-            L, m = R
-            nb_values += m
+"""
+Add v exactly to a list of non-overlapping partial sums (as math.fsum does):
+fsum(partials) is then the correctly rounded sum of all the values added, in
+any order
+"""
+def addexact(partials, v):
+    i = 0
+    for y in partials:
+        if abs(v) < abs(y):
+            v, y = y, v
+        hi = v + y
+        lo = y - (hi - v)
+        if lo:
+            partials[i] = lo
+            i += 1
+        v = hi
+    partials[i:] = [v]
+
+"""
+Running statistics of compressed streams: points n, values of the records m,
+sums of the errors e and squared errors s (exact partial sums, see addexact),
+max error x, sum of delays d, max delay w and discarded points i. Accumulators of several
+channels or files merge exactly and in any order into the same figures.
+"""
+class PLAStats():
+    __slots__ = ('n', 'm', 'e', 's', 'x', 'd', 'w', 'i')
+
+    def __init__(self):
+        self.n = self.m = self.d = self.w = self.i = 0
+        self.x = 0
+        self.e, self.s = [], []
+
+    # errors is the sum of the errors of n points, squares of their squares
+    def add(self, n, errors, squares, merror, delays, mdelay, discarded):
+        self.n += n
+        addexact(self.e, errors)
+        addexact(self.s, squares)
+        if merror > self.x:
+            self.x = merror
+        self.d += delays
+        if mdelay > self.w:
+            self.w = mdelay
+        self.i += discarded
+
+    def merge(self, other):
+        self.n += other.n
+        self.m += other.m
+        for v in other.e:
+            addexact(self.e, v)
+        for v in other.s:
+            addexact(self.s, v)
+        self.x = max(self.x, other.x)
+        self.d += other.d
+        self.w = max(self.w, other.w)
+        self.i += other.i
+        return self
+
+    @classmethod
+    def merged(cls, stats):
+        total = cls()
+        for other in stats:
+            total.merge(other)
+        return total
+
+    def compression(self):
+        return self.m/max(self.n, 1)
+
+    def avgerror(self):
+        return fsum(self.e)/max(self.n, 1)
+
+    def rmserror(self):
+        return sqrt(fsum(self.s)/max(self.n, 1))
+
+    def avgdelay(self):
+        return self.d/max(self.n, 1)
+
+    def summary(self):
+        return {'points': self.n, 'values': self.m,
+                'compression': self.compression(),
+                'avg error': self.avgerror(), 'rms error': self.rmserror(),
+                'max error': self.x, 'avg delay': self.avgdelay(),
+                'max delay': self.w, 'discarded': self.i}
+
+"""
+Statistics of one channel added record by record: n points read when the
+record is output, its weight m and its (original, reconstructed) pairs, as
+genplapairs yields them; the sums of the last records are added to stats by
+blocks of FLUSHRECORDS, and the weights of the records output upon the same
+point as one group
+"""
+class ChannelStats():
+    def __init__(self, maxerror, deltatime, verbose=False):
+        self.stats = PLAStats()
+        self.maxerror, self.deltatime = maxerror+DELTA, deltatime+DELTA
+        self.verbose = verbose
+        self.read = self.groupweight = self.original = self.records = 0
+        self.sums = (0, 0, 0, 0, 0, 0)
+
+    # sums of the last records, added to stats
+    def flush(self):
+        errors, merror, sumerror2, delays, mdelay, discarded = self.sums
+        self.stats.add(self.original-self.stats.n, errors, sumerror2, merror,
+                       delays, mdelay, discarded)
+        self.sums, self.records = (0, 0, 0, 0, 0, 0), 0
+
+    def add(self, read, m, pairs):
+        if read != self.read:           # records output upon the same point
+            self.stats.m += self.groupweight
+            self.read, self.groupweight = read, 0
+        self.groupweight += m
+
+        maxerror, deltatime, verbose = self.maxerror, self.deltatime, \
+                                       self.verbose
+        n, nb_original = read, self.original
+        errors, merror, sumerror2, delays, mdelay, discarded = self.sums
+        for ((xorig,yorig), point) in pairs:
+            if point is None:           # End of file uncompressed ?
+                if verbose:
+                    print("BUG:", xorig, yorig, " has not been reconstructed!")
+                discarded += 1
+                continue
+
+            x, y = point
+            nb_original += 1
+            error = abs(y-yorig)
+
+            if error > merror:
+                merror = error
+            delays += (n-nb_original)
+            if n-nb_original > mdelay:
+                mdelay = n-nb_original
             
-            for (x,y) in L:
-                
-                xorig, yorig = next(originalstream)
-
-                nb_original += 1
-                error = abs(y-yorig)
-
-                merror = max(merror,error)
-                delays += (n-nb_original)
-                
-                # Check for bugs in invoked method and discard if found
-                if error > maxerror+DELTA or abs(xorig-x) > deltatime+DELTA:
-                    if verbose and abs(xorig-x) > deltatime+DELTA:
-                        print("BUG: reconstructed timestamp", x, "expected", xorig)
-                    if verbose and error > maxerror+DELTA:
-                        print("BUG: expected", xorig, yorig, \
-                              "got", x, y, "error", yorig-y)
-                    discarded += 1
-
-                #else:
-                sumerror2 += error*error
-                errors += error
-                
-                
-                
-    #except StopIteration:
-    #    if verbose:
-    #        print("BUG: too many reconstructed tuples!")
-
-    
-    for x, y in originalstream:                    # End of file uncompressed ?
-        if verbose:
-            print("BUG:", x, y, " has not been reconstructed!")
-        discarded += 1
-
-    nb_original = 1 if nb_original == 0 else nb_original
-
-    stats = {}
-    stats['m'] = nb_values
-    stats['n'] = nb_original
-    stats['x'] = merror
-    stats['s'] = sumerror2
-    stats['d'] = delays
-    stats['e'] = errors
-    stats['i'] = discarded
-
-    return stats
-
-def printstats(stats):
-    print("Nb records\t", stats['n'])
-    print("Avg compr.\t", stats['m']/stats['n'])
-    print("Avg error\t", stats['e']/stats['n'])
-    print("RMS error\t", sqrt(stats['s']/stats['n']))
-    print("Max error\t", stats['x'])
-    print("Avg delay\t", stats['d']/stats['n'])
-    print("Avg discarded\t", stats['i']/stats['n'])
-
-def printstatsall(stats,errors):
+            # Check for bugs in invoked method and discard if found
+            if error > maxerror or abs(xorig-x) > deltatime:
+                if verbose and abs(xorig-x) > deltatime:
+                    print("BUG: reconstructed timestamp", x, "expected", xorig)
+                if verbose and error > maxerror:
+                    print("BUG: expected", xorig, yorig, \
+                          "got", x, y, "error", yorig-y)
+                discarded += 1
+
+            sumerror2 += error*error
+            errors += error
+
+        self.original = nb_original
+        self.sums = (errors, merror, sumerror2, delays, mdelay, discarded)
+        self.records += 1
+        if self.records == FLUSHRECORDS:
+            self.flush()
+
+    def close(self):
+        self.flush()
+        self.stats.m += self.groupweight
+        self.groupweight = 0
+        return self.stats
+
+"""
+Live reporting: a JSON line with the statistics of the channel whose record
+is due, of each axis and overall is appended to a file every points points
+and/or seconds seconds (checked after each record), and a last one at close;
+the channels of the file being evaluated (ChannelStats per axis) count with
+the finished ones
+"""
+class StatsSnapshots():
+    def __init__(self, filename, points=0, seconds=0):
+        self.f = open(filename, "a")
+        self.points, self.seconds = points, seconds
+        self.axes = defaultdict(PLAStats)       # finished channels per axis
+        self.total = PLAStats()
+        self.filename, self.channels = None, {}
+        self.nextn = points or inf
+        self.nextt = monotonic()+seconds if seconds else inf
+
+    def start(self, filename, channels):
+        self.filename, self.channels = filename, channels
+
+    def due(self):
+        n = sum(channel.original for channel in self.channels.values())
+        return self.total.n + n >= self.nextn or \
+               (self.seconds and monotonic() >= self.nextt)
+
+    def write(self, axis=None):
+        current = {}
+        for i, channel in self.channels.items():
+            channel.flush()
+            current[i] = channel.stats
+        snapshot = {'time': time(), 'file': self.filename, 'axis': axis}
+        if axis is not None:
+            snapshot['channel'] = current[axis].summary()
+        snapshot['axes'] = {i: PLAStats.merged(
+                                (total, current[i]) if i in current
+                                else (total,)).summary()
+                            for i, total in self.axes.items()}
+        for i, stats in current.items():
+            if i not in self.axes:
+                snapshot['axes'][i] = stats.summary()
+        overall = PLAStats.merged([self.total] + list(current.values()))
+        snapshot['overall'] = overall.summary()
+
+        self.f.write(json.dumps(snapshot) + "\n")
+        self.f.flush()
+        if self.points:
+            self.nextn = overall.n + self.points
+        if self.seconds:
+            self.nextt = monotonic() + self.seconds
+
+    # once the channels are closed
+    def finish(self):
+        for i, channel in self.channels.items():
+            self.axes[i].merge(channel.stats)
+            self.total.merge(channel.stats)
+        self.filename, self.channels = None, {}
+
+    def close(self):
+        self.write()
+        self.f.close()
+
+"""
+Pass the records of genpairs to the statistics of their channel (axis of
+snapshots), yielding the number of points read and the pairs of each
+"""
+def genevaluated(genpairs, channel, snapshots=None, axis=None):
+    for (read, m, pairs) in genpairs:
+        channel.add(read, m, pairs)
+        if snapshots is not None and snapshots.due():
+            snapshots.write(axis)
+        yield read, pairs
+
+"""
+Reconstructed tuples of the evaluated records of a channel
+"""
+def genreconstructedpairs(evaluated):
+    for read, pairs in evaluated:
+        for original, point in pairs:
+            if point is not None:
+                yield point
+
+"""
+Run evaluated channels (a dict of genevaluated) to their end in one pass,
+advancing first the one that has read the fewest points: the rows and times
+they share are then only kept while the channels are apart, about the delay of
+their records
+"""
+def runchannels(evaluated):
+    heap = [(0, k, key) for k, key in enumerate(evaluated)]
+    while heap:
+        read, k, key = heap[0]
+        try:
+            read, pairs = next(evaluated[key])
+        except StopIteration:
+            heappop(heap)
+            continue
+        heapreplace(heap, (read, k, key))
+
+def plastats(genpairs, maxerror, deltatime, verbose=False, snapshots=None):
+    channel = ChannelStats(maxerror, deltatime, verbose)
+    for evaluated in genevaluated(genpairs, channel, snapshots):
+        pass
+    return channel.close()
+
+def printstats(stats, maxdelay=False):
+    print("Nb records\t", stats.n)
+    print("Avg compr.\t", stats.compression())
+    print("Avg error\t", stats.avgerror())
+    print("RMS error\t", stats.rmserror())
+    print("Max error\t", stats.x)
+    print("Avg delay\t", stats.avgdelay())
+    if maxdelay:
+        print("Max delay\t", stats.w)
+    print("Avg discarded\t", stats.i/max(stats.n, 1))
+
+"""
+Table of the statistics of each axis (a dict of PLAStats) and, for several
+axes, of all of them, with their max delay under a latency bound; given the
+statistics of the same axes without the bound (unbounded), also the cost of
+the bound: the relative increase of the compressed size
+"""
+def printstatsall(stats,errors,maxdelay=False,unbounded=None):
     lines = ["Column (err)\t", "No records\t", "Avg compr. %\t",
              "Avg error\t", "RMS error\t",
-             "Max error\t", "Avg delay\t", "Avg disc. %\t"]
+             "Max error\t", "Avg delay\t", "Max delay\t", "Avg disc. %\t"]
+    if unbounded is not None:
+        lines += ["Unbnd compr. %\t", "Latency cost %\t"]
     myformati = lambda i : "|"+'{:10}'.format(i)
     myformatf = lambda f : "|"+'{:10.3f}'.format(f)
 
-    def add_column_stat(stats):
-        lines[1] += myformati(stats['n'])
-        lines[2] += myformatf(100*stats['m']/stats['n'])
-        lines[3] += myformatf(stats['e']/stats['n'])
-        lines[4] += myformatf(sqrt(stats['s']/stats['n']))
-        lines[5] += myformatf(stats['x'])
-        lines[6] += myformatf(stats['d']/stats['n'])
-        lines[7] += myformatf(100*stats['i']/stats['n'])
-
-    if stats['n'] == 0:
+    def add_column_stat(stats, free):
+        lines[1] += myformati(stats.n)
+        lines[2] += myformatf(100*stats.m/max(stats.n, 1))
+        lines[3] += myformatf(stats.avgerror())
+        lines[4] += myformatf(stats.rmserror())
+        lines[5] += myformatf(stats.x)
+        lines[6] += myformatf(stats.avgdelay())
+        lines[7] += myformati(stats.w)
+        lines[8] += myformatf(100*stats.i/max(stats.n, 1))
+        if free is not None:
+            lines[9] += myformatf(100*free.m/max(free.n, 1))
+            lines[10] += myformatf(100*(stats.m/max(free.m, 1)-1))
+
+    overall = PLAStats.merged(stats.values())
+    if overall.n == 0:
         #print("Empty directory")
         return
 
     for i in range(len(errors)):
         if errors[i] >= 0:
             lines[0] += "|"+'{:1} ({:6})'.format(i, errors[i])
-            add_column_stat(stats[i])
+            add_column_stat(stats[i],
+                            None if unbounded is None else unbounded[i])
 
     if len([err for err in errors if err>=0]) > 1:
         lines[0] += "|    "+'OVERALL'
-        add_column_stat(stats)   
-            
+        add_column_stat(overall, None if unbounded is None
+                        else PLAStats.merged(unbounded.values()))
+
+    if not maxdelay:
+        del lines[7]
     print("\n".join(lines))
         
-# errors is a list of error for each axis, -1 disactivate PLA on that axis 
-def plastatsdir(files, compressors, errors, timestamps=0, verb=False, perfile=False, sep=","):
-    stats = defaultdict(int)
+"""
+Records of value channel i compressed with its rows against times (channel 0
+as original or reconstructed tuples, not read with logical timestamps)
+"""
+def genaxispairs(compressor, error, rows, times=None, timestamps=0):
+    if timestamps == 1:
+        data, originals = tee(rows)
+        return compressor.genplapairs(logicaltimestream(data), error, None,
+                                      originals)
+
+    if timestamps == 2:
+        return compressor.genplapairs(rows, error, genvalues(times))
+
+    data, originals = tee(rows)
+    timed, stamps = tee(times)
+    return compressor.genplapairs(approximatedtimestream(timed, data), error,
+                                  genvalues(stamps), originals)
+
+"""
+Statistics of one file for each compressed axis: the rows are read once and
+passed to the compressors of all axes as they go, channel 0 being compressed
+once and its reconstruction serving as time channel
+"""
+def plastatsfile(filename, compressors, errors, timestamps=0, verb=False,
+                 perfile=False, sep=",", log=None, snapshots=None):
     axes = list(i for i in range(len(errors)) if errors[i] >= 0)
+    timed = [i for i in axes if i > 0 and timestamps != 1]
     deltatime = max(errors[0],0)
-    
-    for i in axes:
-        stats[i] = defaultdict(int)
-    
-    for filename in files:
-        for i in axes:
-            if verb and perfile:
-                print("processing", filename, "column", i)
-                print("-"*80)
+    if verb and perfile:
+        print("processing", filename, "columns", *axes)
+        print("-"*80)
 
-            filestrm1, filestrm2 = tee(streamfile(filename, i, sep))
-            
-            if i == 0:
-                timedstream, time2 = tee(filestrm1)
-                gendatastrm = compressors[i].genplastream(timedstream, errors[i], gentimestamps(time2))
-            else:
-                if timestamps == 1:
-                    timedstream = logicaltimestream(filestrm1)
-                    deltatime = float('inf')
-                    time1, time2 = tee(timedstream)
-                    gendatastrm = compressors[i].genplastream(time1, errors[i], gentimestamps(time2))
-            
-                else:
-                    
-                    if errors[0] < 0:
-                        gentimes = streamfile(filename, 0, sep)
-                    else:
-                        gentimes = genreconstructed(compressors[0],
-                                    streamfile(filename, 0, sep), errors[0])
-
-                    if timestamps == 2:
-                        gendatastrm = compressors[i].genplastream(filestrm1, errors[i], genvalues(gentimes))
-            
-                    else:
-                        time1, time2 = tee(gentimes)
-                        timedstream = approximatedtimestream(time1, filestrm1)
-                        gendatastrm = compressors[i].genplastream(timedstream, errors[i], genvalues(time2))
-            
-            stats[i][filename] = plastats(filestrm2, gendatastrm, errors[i],
-                                          deltatime, verb, sep)
+    rows = streamaxes(filename, sorted(set(axes + ([0] if timed else []))),
+                      sep, log)
+    channels = {i: ChannelStats(errors[i], inf if i > 0 and timestamps == 1
+                                else deltatime, verb) for i in axes}
+    if snapshots is not None:
+        snapshots.start(filename, channels)
+
+    evaluated = {}
+    if 0 in axes:
+        evaluated[0] = genevaluated(compressors[0].genplapairs(rows[0],
+                                    errors[0]), channels[0], snapshots, 0)
+    times = iter(())
+    if timed and 0 in axes:                     # channel 0 reconstructed
+        evaluated[0], reconstructed = tee(evaluated[0])
+        times = genreconstructedpairs(reconstructed)
+    elif timed:
+        times = rows[0]
+    times = iter(tee(times, len(timed)))
+
+    for i in (i for i in axes if i > 0):
+        genpairs = genaxispairs(compressors[i], errors[i], rows[i],
+                                next(times) if i in timed else None,
+                                timestamps)
+        evaluated[i] = genevaluated(genpairs, channels[i], snapshots, i)
+    runchannels(evaluated)
+
+    stats = {i: channels[i].close() for i in axes}
+    if snapshots is not None:
+        snapshots.finish()
+    return stats
 
-        for i in axes:        
-            for v in "mnsdei":
-                stats[i][v] += stats[i][filename][v]
-                stats[v] += stats[i][filename][v] 
-            stats['x'] = max(stats['x'], stats[i][filename]['x'])
-            stats[i]['x'] = max(stats[i]['x'], stats[i][filename]['x'])
+# errors is a list of error for each axis, -1 disactivate PLA on that axis 
+# returns the PLAStats of each axis
+def plastatsdir(files, compressors, errors, timestamps=0, verb=False,
+                perfile=False, sep=",", jobs=1, log=None, snapshots=None):
+    axes = list(i for i in range(len(errors)) if errors[i] >= 0)
+    stats = {i: PLAStats() for i in axes}
+
+    work = partial(plastatsfile, compressors=compressors, errors=errors,
+                   timestamps=timestamps, verb=verb, perfile=perfile, sep=sep,
+                   log=log)
+
+    # files are processed in parallel but merged in order, live snapshots are
+    # taken and malformed rows logged in this process only (the workers would
+    # append to the log file at once)
+    if snapshots is not None:
+        jobs = 1
+        work = partial(work, snapshots=snapshots)
+    if log is not None:
+        jobs = 1
+    pool = ProcessPoolExecutor(jobs) if jobs > 1 else None
+    results = pool.map(work, files) if pool else map(work, files)
+
+    for filename, filestats in zip(files, results):
+        for i in axes:
+            stats[i].merge(filestats[i])
 
             if perfile:
-                printstats(stats[i][filename])
+                printstats(filestats[i], compressors[i].protocol.bounded())
                 print("-"*80)
 
+    if pool:
+        pool.shutdown()
+
     return stats
     
+"""
+Sweep error bounds (and methods) in one pass over the files: the rows of each
+file are read once and passed to the compressors of every method, bound and
+value channel with a non-negative error, channel 0 being compressed once per
+method; stats[(method, bound)] sums the value channels as the OVERALL column
+does
+"""
+def plastatssweep(files, makers, errors, bounds, timestamps=0, verb=False,
+                  sep=",", log=None):
+    stats = {(method, e): PLAStats() for method in makers for e in bounds}
+    axes = list(i for i in range(1, len(errors)) if errors[i] >= 0)
+    deltatime = max(errors[0],0) if timestamps != 1 else inf
+    timed = timestamps != 1
+
+    for filename in files:
+        if verb:
+            print("processing", filename)
+        rows = streamaxes(filename, ([0] if timed else []) + axes, sep, log)
+        branches = {i: iter(tee(rows[i], len(makers)*len(bounds)))
+                    for i in axes}
+        timerows = iter(tee(rows[0], len(makers)) if timed else ())
+
+        evaluated, channels = {}, {}
+        for method, make in makers.items():
+            times = next(timerows, None)
+            if timed and errors[0] >= 0:        # channel 0 reconstructed
+                evaluated[method], reconstructed = tee(genevaluated(
+                    make().genplapairs(times, errors[0]),
+                    ChannelStats(errors[0], max(errors[0],0), verb)))
+                times = genreconstructedpairs(reconstructed)
+            times = iter(tee(times, len(bounds)*len(axes)) if timed else ())
+
+            for e in bounds:
+                for i in axes:
+                    channels[(method, e, i)] = ChannelStats(e, deltatime, verb)
+                    genpairs = genaxispairs(make(), e, next(branches[i]),
+                                            next(times, None), timestamps)
+                    evaluated[(method, e, i)] = genevaluated(
+                        genpairs, channels[(method, e, i)])
+        runchannels(evaluated)
+
+        for (method, e, i), channel in channels.items():
+            stats[(method, e)].merge(channel.close())
+    return stats
+
+def printsweep(stats):
+    lines = ["Method\t\t|     Error|  Compr. %| Avg error| RMS error|"
+             " Max error| Avg delay"]
+    myformatf = lambda f : "|"+'{:10.3f}'.format(f)
+
+    for (method, e), stat in stats.items():
+        lines.append('{:16}'.format(method) + "|"+'{:10}'.format(e)
+                     + myformatf(100*stat.m/max(stat.n, 1))
+                     + myformatf(stat.avgerror()) + myformatf(stat.rmserror())
+                     + myformatf(stat.x) + myformatf(stat.avgdelay()))
+
+    print("\n".join(lines))
+
+"""
+Sizes of the records of each compressed axis (genzip(filename, i) gives them)
+coded in blocks: per axis, the points, the bytes of the binary records and of
+the blocks, summed over the files
+"""
+def plablockstats(files, genzip, compressors, errors, codec, blockrecords):
+    from plablocks import BlockEncoder
+    sizes = {}
+    for filename in files:
+        for i in range(len(errors)):
+            if errors[i] >= 0:
+                encoder = BlockEncoder(compressors[i].protocol, codec,
+                                       blockrecords)
+                for record in genzip(filename, i):
+                    encoder.add(record)
+                encoder.flush()
+                n, raw, coded = sizes.get(i, (0, 0, 0))
+                sizes[i] = (n+encoder.points, raw+encoder.rawbytes,
+                            coded+encoder.bytes)
+    return sizes
+
+def printblockstats(sizes, errors, inputsize):
+    lines = ["Column (err)\t", "No records\t", "Binary bytes\t",
+             "Coded bytes\t", "Binary compr. %\t", "Coded compr. %\t",
+             "Coded/binary %\t"]
+    myformati = lambda i : "|"+'{:10}'.format(i)
+    myformatf = lambda f : "|"+'{:10.3f}'.format(f)
+
+    def add_column_sizes(n, raw, coded):
+        lines[1] += myformati(n)
+        lines[2] += myformati(raw)
+        lines[3] += myformati(coded)
+        lines[4] += myformatf(100*raw/max(n*inputsize, 1))
+        lines[5] += myformatf(100*coded/max(n*inputsize, 1))
+        lines[6] += myformatf(100*coded/max(raw, 1))
+
+    for i, (n, raw, coded) in sorted(sizes.items()):
+        lines[0] += "|"+'{:1} ({:6})'.format(i, errors[i])
+        add_column_sizes(n, raw, coded)
+
+    if len(sizes) > 1:
+        lines[0] += "|    "+'OVERALL'
+        add_column_sizes(*map(sum, zip(*sizes.values())))
+
+    print("\n".join(lines))
+
+"""
+Delays and compression of the channels axes compressed separately
+(compressors, one per channel) and jointly (joint, a JointCompressor): for
+each mode, the tuples, the sums of the channels' delays, of the tuples' delays
+(max over the channels) and of the records' weights, over the files
+"""
+def plajointdelays(files, axes, compressors, joint, errors, sep=",",
+                   log=None):
+    stats = {'separate': [0, 0, 0, 0], 'joint': [0, 0, 0, 0]}
+
+    for filename in files:
+        for mode, sums in stats.items():
+            weights = []
+            streams = [streamfilelogicaltime(filename, i, sep,
+                                             log if mode == 'separate' else None)
+                       for i in axes]
+            if mode == 'joint':
+                gen = genjointdelays(joint, streams, errors, weights)
+            else:
+                gen = genddelays(compressors, streams, errors, weights)
+
+            for delays in gen:
+                sums[0] += 1
+                sums[1] += sum(delays)
+                sums[2] += max(delays)
+            sums[3] += fsum(weights)
+    return stats
+
+def printjointdelays(stats, channels):
+    lines = ["Channels\t|  Compr. %| Avg delay| Avg tuple delay"]
+    myformatf = lambda f, width=10 : "|"+'{:{}.3f}'.format(f, width)
+
+    # the delay of a tuple is the largest of its channels'
+    for mode, (n, delays, maxdelays, m) in stats.items():
+        n = max(n, 1)
+        lines.append('{:16}'.format(mode) + myformatf(100*m/(n*channels))
+                     + myformatf(delays/(n*channels))
+                     + myformatf(maxdelays/n, 15))
+
+    print("\n".join(lines))
+
+# compressors that can be swept by name: module and compressor maker
+METHODS = {'angle': ('angle', 'makecompressorAngle'),
+           'linear': ('linear', 'makecompressorlinear'),
+           'convexhull': ('convexhull', 'ConvexhullCompressor'),
+           'blocklinear': ('blocklinear', 'makecompressorblocklinear')}
+
 def processfile(makecompressor):
     parser = argparse.ArgumentParser(description="""
                 Compute different PLA statistics using by default
@@ -221,10 +638,29 @@ def processfile(makecompressor):
 
     parser.add_argument("-o", "--outputsize", default=8, type=int,
                         help="""set output size in bytes (for alpha/beta);
-                        default=8; """)
+                        default=8; values and coefficients are rounded to
+                        floats of 2 or 4 bytes, the error left for segments
+                        being reduced by 1/4 or 1/256""")
+    parser.add_argument("-P", "--precision", type=float, metavar="STEP",
+                        help="""store values and coefficients as fixed point
+                        integers of -t/-o bytes counting steps of STEP, the
+                        error left for segments being reduced by STEP""")
 
     parser.add_argument("-S", "--singleoff", help="turn off singleton values",
                         action="store_true")
+    parser.add_argument("-k", "--maxdelay", type=int, metavar="POINTS",
+                        help="""latency bound: flush the points held at the
+                        latest upon the point read POINTS points after the
+                        oldest of them (at least 2, 3 with -I); the statistics
+                        then also give the max delay""")
+    parser.add_argument("-T", "--maxtime", type=float, metavar="T",
+                        help="""latency bound in timestamp units: flush the
+                        points held at the latest upon the first point read T
+                        after the oldest of them""")
+    parser.add_argument("--latencycost", action="store_true",
+                        help="""with -k/-T, also compress the files without the
+                        bound and give the compression lost to it (twice the
+                        compression time)""")
 
     parser.add_argument("-l", "--logicaltimes", help="""uses logical timestamps for all
                         fields (default use channel 0 as time channel)""",
@@ -235,6 +671,16 @@ def processfile(makecompressor):
 
     parser.add_argument("-x", "--zip", action="store_true",
                         help="""outputs pla compression records""")
+    parser.add_argument("-B", "--binary", action="store_true",
+                        help="""with -x, write binary records to standard output
+                        (layout of C/pla-decompress with -b 255 -t 4 -o 4)""")
+    parser.add_argument("-Z", "--blocks", metavar="CODEC",
+                        choices=('none', 'zlib', 'lzma'),
+                        help="""code the binary records in blocks (varints,
+                        XORed floats, then CODEC among none, zlib, lzma) and
+                        output their sizes; with -x -B, write the blocks""")
+    parser.add_argument("--blockrecords", default=1024, type=int, metavar="N",
+                        help="records per block with -Z; default=1024")
     parser.add_argument("-n", "--endpoints", action="store_true",
                         help="""outputs pla segments' endpoints + singletons""")
     
@@ -242,19 +688,80 @@ def processfile(makecompressor):
                         help="""outputs reconstructed values""")
     parser.add_argument("-D", "--ndelays", action="store_true",
                         help="""outputs average max delays (multi-dim. delays)""")
+    parser.add_argument("-J", "--joint", action="store_true",
+                        help="""with -D, compare the channels compressed
+                        separately and jointly (shared segment boundaries, one
+                        counter per segment, single stream protocol)""")
     
+    parser.add_argument("-w", "--sweep", metavar="E1,E2,...",
+                        help="""output a trade-off table compressing the value
+                        channels with each of these errors in a single pass""")
+    parser.add_argument("-M", "--methods", metavar="M1,M2,...",
+                        help="""with --sweep, compare these methods (among """
+                        + ", ".join(METHODS) + """) instead of the program's""")
     parser.add_argument("-s", "--sep", default=',',
                         help="set datafile column sep; default=','")
+    parser.add_argument("-L", "--log", metavar="FILE",
+                        help="""append the malformed rows of csv files to this
+                        file (file:line:row); their number is reported on
+                        stderr (runs files serially)""")
+    parser.add_argument("-F", "--floats", type=int, metavar="COLUMNS",
+                        help="""read binary files of floats (size set by -t)
+                        with COLUMNS interleaved channels, e.g. 1 for csv2bin
+                        output; directories are searched for .bin files""")
     parser.add_argument("-p", "--perfile", help="""if target is a directory,
                         print statistics for each processed file""",
                         action="store_true")
+    parser.add_argument("-j", "--jobs", default=1, type=int,
+                        help="""number of worker processes sharing the files
+                        of a directory; default=1""")
     parser.add_argument("-v", "--verbose", help="increase output verbosity",
                         action="store_true")
     parser.add_argument("-q", "--quiet", help="turn off output",
                         action="store_true")
+    parser.add_argument("--snapshots", metavar="FILE",
+                        help="""append the running statistics (channel, axis
+                        and overall) as JSON lines to this file every --every
+                        points and/or --period seconds (runs files serially)""")
+    parser.add_argument("--every", default=0, type=int, metavar="N",
+                        help="points between snapshots; default=0 (off)")
+    parser.add_argument("--period", default=0, type=float, metavar="T",
+                        help="seconds between snapshots; default=0 (off)")
+    parser.add_argument("--profile", nargs='?', const='', metavar="JSON",
+                        help="""count compressor calls, records and hull sizes
+                        and time each stage; report on stderr or save as JSON
+                        to the given file (runs files serially)""")
 
     args = parser.parse_args()
-    
+    if args.twostream and (args.binary or args.blocks):
+        parser.error("binary records (-B, -Z) need a single stream protocol")
+    for method in args.methods.split(',') if args.methods else ():
+        if method not in METHODS:
+            parser.error("unknown method %r in -M (choose from %s)"
+                         % (method, ", ".join(METHODS)))
+    mindelay = (TwoStreamsProtocol if args.twostream else Protocol).MINDELAY
+    if args.maxdelay is not None and args.maxdelay < mindelay:
+        parser.error("latency bound -k below %d points%s"
+                     % (mindelay, " with -I" if args.twostream else ""))
+
+    if args.profile is None:
+        processargs(args, makecompressor)
+        return
+
+    profile = Profile()
+    args.jobs = 1                       # profiles are counted in this process
+    processargs(args, makecompressor, profile)
+    if args.profile:
+        with open(args.profile, "w") as f:
+            json.dump(profile.results(), f, indent=1)
+    else:
+        profile.report(stderr)
+
+"""
+Run the command line of processfile with the compressors of makecompressor,
+instrumented for the profile if given
+"""
+def processargs(args, makecompressor, profile=None):
     errors = args.errors
     
     if args.twostream:
@@ -266,38 +773,97 @@ def processfile(makecompressor):
     else:
         protocol =  SingleStreamProtocol
 
+    # protocol of the compressors, latency bounded as set by -k/-T
+    def makeprotocol(maxdelay=args.maxdelay, maxtime=args.maxtime):
+        return protocol(args.bnd, args.inputsize, args.outputsize,
+                        not args.singleoff, args.precision, maxdelay, maxtime)
+
     compressors = [makecompressor() for e in errors]
+    if profile is not None:
+        compressors = [profiled(c, profile) for c in compressors]
     for i in range(len(errors)):
-        compressors[i].setprotocol(
-            protocol(args.bnd, args.inputsize, args.outputsize,
-                     not args.singleoff)) 
+        compressors[i].setprotocol(makeprotocol())
+
+    if args.floats:                     # binary input instead of csv
+        source = BinaryFormat(args.floats, args.inputsize)
+        extension = '.bin'
+    else:
+        source = args.sep
+        extension = '.csv'
 
     if isdir(args.target):
         files = [join(args.target, file) for file in listdir(args.target)
-                 if file.endswith('.csv')]
+                 if file.endswith(extension)]
     else:
         files = [args.target]
 
+    # records of channel i against logical timestamps, by blocks if possible
+    def genzip(filename, i):
+        if args.floats and hasattr(compressors[i], 'compressarray'):
+            channel = mapbinfile(filename, source)[i]
+            return compressors[i].compressarray(channel, errors[i])
+
+        data = logicaltimestream(streamfile(filename,i,source,args.log))
+        compress = getattr(compressors[i], 'compressblocks',
+                           compressors[i].compress)
+        return compress(data, errors[i])
+
+    if args.zip and args.binary:
+        from plabin import writerecords
+        from plablocks import writeblocks
+        out = stdout.buffer
+        for filename in files:
+            for i in range(len(errors)):
+                if errors[i] != -1 and args.blocks:
+                    writeblocks(out, genzip(filename, i),
+                                compressors[i].protocol, args.blocks,
+                                args.blockrecords)
+                elif errors[i] != -1:
+                    writerecords(out, genzip(filename, i),
+                                 compressors[i].protocol, local=True)
+        out.flush()
+        return
+
+    if args.blocks:
+        sizes = plablockstats(files, genzip, compressors, errors, args.blocks,
+                              args.blockrecords)
+        print("Nb of files\t", len(files))
+        printblockstats(sizes, errors, args.inputsize)
+        return
+
     if args.zip:
         for filename in files:
             for i in range(len(errors)):
                 if errors[i] != -1:
-                    data = logicaltimestream(streamfile(filename,i,args.sep))
                     if args.verbose:
                         print(filename, "axis", i, "maxerror", errors[i])
-                    for record in compressors[i].compress(data, errors[i]):
+                    for record in genzip(filename, i):
                         if len(record) == 3:
                             print(record[0],record[1],record[2],sep=args.sep)
                         else:
                             print(record[0],record[1],sep=args.sep)
         return
 
+    if args.ndelays and args.joint:
+        axes = [i for i in range(len(errors)) if errors[i] >= 0]
+        joint = JointCompressor([makecompressor() for i in axes])
+        joint.setprotocol(JointProtocol(len(axes), args.bnd, args.inputsize,
+                                        args.outputsize, not args.singleoff,
+                                        args.precision, args.maxdelay,
+                                        args.maxtime))
+        stats = plajointdelays(files, axes, [compressors[i] for i in axes],
+                               joint, [errors[i] for i in axes], source,
+                               args.log)
+        printjointdelays(stats, len(axes))
+        return
+
     if args.ndelays:
         nbtuples = muldimdelaysum = 0
         delaysums = [0]*len(errors)
         
         for filename in files:
-            datastreams = [streamfilelogicaltime(filename,i) for i in range(len(errors))]
+            datastreams = [streamfilelogicaltime(filename,i,source,args.log)
+                           for i in range(len(errors))]
 
             for delays in genddelays(compressors, datastreams, errors):
                 nbtuples += 1
@@ -315,8 +881,8 @@ def processfile(makecompressor):
         for filename in files:
             for i in range(len(errors)):
                 if errors[i] != -1:
-                    data = streamfilelogicaltime(filename,i,args.sep)
-                    timestream = logicaltimes(streamfile(filename,0,args.sep))
+                    data = streamfilelogicaltime(filename,i,source,args.log)
+                    timestream = logicaltimes(streamfile(filename,0,source))
                     for (p,R) in compressors[i].genplastream(data, errors[i], timestream):
                         if R is not None:
                             L, m = R
@@ -333,25 +899,63 @@ def processfile(makecompressor):
     elif args.realtimes:
         times = 2
 
+    if args.sweep:
+        def maker(make):
+            def makeprotocolled():
+                compressor = make()
+                if profile is not None:
+                    profiled(compressor, profile)
+                compressor.setprotocol(makeprotocol())
+                return compressor
+            return makeprotocolled
+
+        if args.methods:
+            makers = {}
+            for method in args.methods.split(','):
+                module, name = METHODS[method]
+                makers[method] = maker(getattr(import_module(module), name))
+        else:
+            makers = {splitext(basename(argv[0]))[0]: maker(makecompressor)}
+
+        bounds = [float(e) for e in args.sweep.split(',')]
+        stats = plastatssweep(files, makers, errors, bounds, times,
+                              args.verbose, source, args.log)
+        printsweep(stats)
+        return
+
+    snapshots = None
+    if args.snapshots:
+        snapshots = StatsSnapshots(args.snapshots, args.every, args.period)
     stats = plastatsdir(files, compressors, errors, times,
-                        args.verbose, args.perfile, args.sep)
+                        args.verbose, args.perfile, source, args.jobs,
+                        args.log, snapshots)
+    if snapshots is not None:
+        snapshots.close()
+    overall = PLAStats.merged(stats.values())
 
     if args.compression:
-        print(stats['m']/stats['n'])
+        print(overall.compression())
     if args.avgerror:
-        print(stats['e']/stats['n'])
+        print(overall.avgerror())
     if args.rmserror:
-        print(sqrt(stats['s']/stats['n']))
+        print(overall.rmserror())
     if args.maxerror:
-        print(stats['x'])
+        print(overall.x)
     if args.delay:
-        print(stats['d']/stats['n'])
+        print(overall.avgdelay())
     if args.discarded:
-        print(stats['i'])
+        print(overall.i)
     if args.verbose:
         print("-"*80)
     if not (args.compression or args.avgerror or args.rmserror or args.maxerror
             or args.delay or args.discarded):
+        bounded, unbounded = compressors[0].protocol.bounded(), None
+        if bounded and args.latencycost:        # same files without the bound
+            free = [makecompressor() for e in errors]
+            for compressor in free:
+                compressor.setprotocol(makeprotocol(None, None))
+            unbounded = plastatsdir(files, free, errors, times, False, False,
+                                    source, args.jobs, None)
         print("Nb of files\t", len(files))
-        printstatsall(stats,errors)
+        printstatsall(stats,errors,bounded,unbounded)
         
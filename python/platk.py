@@ -21,30 +21,30 @@ def genvalues(data):
         yield y
 
 def genrecords(compressor, datastream, maxerror):
-    data1, data2 = tee(datastream)
-    for r in compressor.genplastream(data1, maxerror, gentimestamps(data2)):
-        yield r
+    yield from compressor.genplastream(datastream, maxerror)
 
 ### generators ###
 
 def genreconstructed(compressor, datastream, maxerror):
-    for (point,R) in genrecords(compressor, datastream, maxerror):
-        if R is not None:
-            for (x,y) in R[0]:
-                yield (x,y)
+    for (n,m,pairs) in compressor.genplapairs(datastream, maxerror):
+        for (original,point) in pairs:
+            if point is not None:
+                yield point
     
 def generrors(compressor, datastream, maxerror):
-    original_stream, copy_stream = tee(datastream)
-    for (x,y) in genreconstructed(compressor, copy_stream, maxerror):
-        xorig, yorig = next(original_stream)
-        yield abs(y-yorig)
+    for (n,m,pairs) in compressor.genplapairs(datastream, maxerror):
+        for ((xorig,yorig),point) in pairs:
+            if point is not None:
+                yield abs(point[1]-yorig)
         
-def gendelays(compressor, datastream, maxerror):
-    n = m = 0
-    for (point,R) in genrecords(compressor, datastream, maxerror):
-        n += 1
-        if R is not None:
-            for (x,y) in R[0]:
+# the weight of each record is appended to weights if given
+def gendelays(compressor, datastream, maxerror, weights=None):
+    m = 0
+    for (n,weight,pairs) in compressor.genplapairs(datastream, maxerror):
+        if weights is not None:
+            weights.append(weight)
+        for (original,point) in pairs:
+            if point is not None:
                 m += 1
                 yield (n-m)
 
@@ -59,8 +59,8 @@ def genderrors(compressor, datastreams, maxerrors):
     except StopIteration:
         pass
     
-def genddelays(compressors, datastreams, maxerrors):
-    gen = [gendelays(compressors[i], datastreams[i], maxerrors[i])
+def genddelays(compressors, datastreams, maxerrors, weights=None):
+    gen = [gendelays(compressors[i], datastreams[i], maxerrors[i], weights)
            for i in range(len(datastreams))]
     try:
         while True:
@@ -68,6 +68,12 @@ def genddelays(compressors, datastreams, maxerrors):
     except StopIteration:
         pass
 
+# channels compressed jointly (see JointCompressor): one delay for the tuple
+def genjointdelays(compressor, datastreams, maxerrors, weights=None):
+    for delay in gendelays(compressor, jointstream(datastreams),
+                           tuple(maxerrors), weights):
+        yield [delay]*len(datastreams)
+
 ### lists ###
 
 def reconstructedlist(compressor, filename, axes, maxerror):
@@ -96,17 +102,18 @@ def reconstruct0(filename, axes=[1], maxerrors=[1], types=None, ext='x', sep=','
 
     def genrec(axis, error, typ):
         nonlocal n, m, e
-        datastream1, datastream2 = tee(streamfile(filename, axis))
-        for (point,R) in genrecords(compr, datastream1, error):
-            if R is not None:
-                m += R[1]
-                for (x,y) in R[0]:
-                    n += 1
-                    x0, y0 = next(datastream2)
-                    if typ:
-                        y = round(y) if typ is int else typ(y)
-                    e += abs(y-y0)
-                    yield y
+        for (_,weight,pairs) in compr.genplapairs(streamfile(filename, axis),
+                                                  error):
+            m += weight
+            for ((x0,y0),point) in pairs:
+                if point is None:
+                    continue
+                n += 1
+                y = point[1]
+                if typ:
+                    y = round(y) if typ is int else typ(y)
+                e += abs(y-y0)
+                yield y
 
     with open(filename, "r") as f:
         with open(filename+ext, "w") as outf:
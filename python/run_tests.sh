@@ -12,3 +12,173 @@ echo "--------------------------------------------------------------------------
 echo "Linear compressor only on second channel"
 echo "python3 linear.py ../testdata/jagged_testdata.txt -1 0.18"
 python3 linear.py ../testdata/jagged_testdata.txt -l -1 0.18
+echo "----------------------------------------------------------------------------"
+echo "Binary records round trip under the single stream protocols, with"
+echo "segments of up to 255 points (signed counters of Lidar and Variant)"
+python3 - <<'END'
+from io import BytesIO
+from compressor import *
+from linear import makecompressorlinear
+from plabin import writerecords, readrecords
+
+for protocol in (SingleStreamProtocol, SingleStreamLidarProtocol,
+                 SingleStreamVariantProtocol):
+    compressor = makecompressorlinear()
+    compressor.setprotocol(protocol(255))
+    data = logicaltimestream(streamfile("../testdata/sin_testdata.txt", 1))
+    records = list(compressor.compress(data, 0.3))
+    f = BytesIO()
+    writerecords(f, records, compressor.protocol)
+    f.seek(0)
+    assert list(readrecords(f, compressor.protocol)) == records
+    print(protocol.__name__, len(records), "records, longest",
+          max(abs(record[0]) for record in records), "points: ok")
+END
+echo "----------------------------------------------------------------------------"
+echo "Coded blocks round trip under the single stream protocols and codecs"
+python3 - <<'END'
+from io import BytesIO
+from itertools import product
+from compressor import *
+from linear import makecompressorlinear
+from plablocks import writeblocks, readblocks
+
+for protocol in (SingleStreamProtocol, SingleStreamLidarProtocol,
+                 SingleStreamVariantProtocol):
+    for codec, (filename, error) in product(('none', 'zlib', 'lzma'),
+            (("sin_testdata.txt", 0.3), ("jagged_testdata.txt", 0.02),
+             (None, 0.02))):
+        compressor = makecompressorlinear()
+        compressor.setprotocol(protocol(255))
+        if filename is None:            # steps: Lidar horizontal segments
+            data = ((x, float(x//300)) for x in range(1, 3001))
+        else:
+            data = logicaltimestream(streamfile("../testdata/" + filename, 1))
+        records = list(compressor.compress(data, error))
+        f = BytesIO()
+        writeblocks(f, records, compressor.protocol, codec, 16)
+        f.seek(0)
+        decoded = list(readblocks(f, compressor.protocol))
+        # segments are rebased to local timestamps and back: last bits differ
+        assert [r[0] for r in decoded] == [r[0] for r in records]
+        assert all(abs(u-v) <= 1e-9*max(1, abs(v)) for d, r in
+                   zip(decoded, records) for u, v in zip(d[1:], r[1:]))
+    print(protocol.__name__, "blocks: ok")
+END
+echo "----------------------------------------------------------------------------"
+echo "Point lookups of an index filled while compressing, over a list and a store"
+python3 - <<'END'
+from compressor import *
+from linear import makecompressorlinear
+from segmentstore import SegmentStore, SegmentIndex
+
+for protocol in (SingleStreamProtocol, SingleStreamLidarProtocol,
+                 SingleStreamVariantProtocol, TwoStreamsProtocol):
+    compressor = makecompressorlinear()
+    compressor.setprotocol(protocol(255))
+    data = logicaltimestream(streamfile("../testdata/jagged_testdata.txt", 1))
+    listed = SegmentIndex(compressor.protocol)
+    stored = SegmentIndex(compressor.protocol,
+                          SegmentStore(compressor.protocol))
+    for record in compressor.compress(data, 0.05):
+        listed.append(record)
+        stored.append(record)
+    assert len(listed) == len(stored) > 0
+    assert stored.values_between(1, len(stored)) == \
+           listed.values_between(1, len(listed))
+    print(protocol.__name__, len(stored), "points: ok")
+END
+echo "----------------------------------------------------------------------------"
+echo "Linear hull search against the linear scan of the hulls, on curves whose"
+echo "hulls exceed HULLSCAN vertices and whose first vertex breaks the bound"
+python3 - <<'END'
+import random
+import linear
+from compressor import *
+
+def curve(seed, error):
+    r = random.Random(seed)
+    n, m, c = r.randint(40, 120), r.uniform(30, 90), r.uniform(1e-5, 1e-4)
+    return [r.uniform(-error, error/2), r.uniform(0, 1.2*error)] + \
+           [c*(x-m)**2 for x in range(2, n)]
+
+def records(ys, error, scan):
+    linear.HULLSCAN = scan
+    compressor = linear.LinearCompressor()
+    compressor.setprotocol(SingleStreamProtocol(255))
+    return list(compressor.compress(zip(count(1), ys), error))
+
+hullscan = linear.HULLSCAN
+for seed in range(2000):
+    ys = curve(seed, 0.1)
+    assert records(ys, 0.1, hullscan) == records(ys, 0.1, len(ys)), seed
+linear.HULLSCAN = hullscan
+print("2000 curves: ok")
+END
+echo "----------------------------------------------------------------------------"
+echo "Native Linear core against the Python compressor and the linear scan of the"
+echo "hulls, on the same curves"
+python3 - <<'END'
+import random
+from array import array
+import linear, linearnative
+from compressor import *
+
+def curve(seed, error):
+    r = random.Random(seed)
+    n, m, c = r.randint(40, 120), r.uniform(30, 90), r.uniform(1e-5, 1e-4)
+    return [r.uniform(-error, error/2), r.uniform(0, 1.2*error)] + \
+           [c*(x-m)**2 for x in range(2, n)]
+
+def compressor():
+    compressor = linear.LinearCompressor()
+    compressor.setprotocol(SingleStreamProtocol(255))
+    return compressor
+
+if linearnative.LIBRARY is None:
+    print("native library not built: skipped")
+else:
+    hullscan = linear.HULLSCAN
+    for seed in range(2000):
+        ys = curve(seed, 0.1)
+        native = list(compressor().compressarray(array('d', ys), 0.1))
+        python = list(compressor().compress(zip(count(1), ys), 0.1))
+        linear.HULLSCAN = len(ys)
+        scanned = list(compressor().compress(zip(count(1), ys), 0.1))
+        linear.HULLSCAN = hullscan
+        assert native == python == scanned, seed
+    print("2000 curves: ok")
+END
+echo "----------------------------------------------------------------------------"
+echo "Block Linear engine against the linear scan of the hulls, on runs of long"
+echo "curves whose segments are resolved point by point over deep hulls"
+python3 - <<'END'
+import random
+import numpy as np
+import linear, blocklinear
+from compressor import *
+
+def curve(seed, error):
+    r = random.Random(seed)
+    n, m, c = r.randint(40, 1200), r.uniform(30, 1000), r.uniform(1e-7, 1e-4)
+    return [r.uniform(-error, error/2), r.uniform(0, 1.2*error)] + \
+           [c*(x-m)**2 for x in range(2, n)]
+
+def compressor(factory, protocol):
+    compressor = factory()
+    compressor.setprotocol(protocol(1000))
+    return compressor
+
+hullscan = linear.HULLSCAN
+for seed in range(200):
+    ys = sum((curve(4*seed+i, 0.1) for i in range(4)), [])
+    for protocol in (SingleStreamProtocol, SingleStreamLidarProtocol):
+        block = compressor(blocklinear.BlockLinearCompressor, protocol)
+        blocked = list(block.compressarray(np.array(ys), 0.1))
+        linear.HULLSCAN = len(ys)
+        scan = compressor(linear.LinearCompressor, protocol)
+        scanned = list(scan.compress(zip(count(1), ys), 0.1))
+        linear.HULLSCAN = hullscan
+        assert blocked == scanned, (seed, protocol.__name__)
+print("200 runs of curves: ok")
+END
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# Segment Store, columnar in-memory storage of PLA records
+# Last modified 10/2026
+
+import struct
+from array import array
+from bisect import bisect_right
+from sys import byteorder
+
+from compressor import *
+
+SINGLE, LIDAR, VARIANT, TWOSTREAMS = range(4)
+MAGIC = b'PLAS'
+HEADER = struct.Struct('<4sBBQQ')               # magic, kind, order, sizes
+
+"""
+Kind of records output by a protocol
+"""
+def protocolkind(protocol):
+    if isinstance(protocol, TwoStreamsProtocol):
+        return TWOSTREAMS
+    if isinstance(protocol, SingleStreamLidarProtocol):
+        return LIDAR
+    if isinstance(protocol, SingleStreamVariantProtocol):
+        return VARIANT
+    return SINGLE
+
+"""
+Columnar store of the records of one protocol: one entry per record in typed
+arrays (count, a, b and, for the two streams protocol, x0) plus the singleton
+values of all records in a single array. Cumulative offsets give the first
+point (offsets) and first singleton value (voffsets) of each record, so the
+store has len(store)+1 offsets and npoints() = offsets[-1].
+Counts are the records' own: (1,y), (n,a,b), (-n,b) for Lidar horizontal
+segments, (-m,y1,...,ym) for Variant singletons; a two streams record (L,
+segment) has count n (0 without segment) and its singletons L as values.
+"""
+class SegmentStore():
+    def __init__(self, protocol, records=()):
+        self.kind = protocol if isinstance(protocol, int) \
+                    else protocolkind(protocol)
+        self.counts = array('q')
+        self.a = array('d')
+        self.b = array('d')
+        self.x0 = array('d')                    # two streams only
+        self.values = array('d')
+        self.offsets = array('q', [0])
+        self.voffsets = array('q', [0])
+        self.extend(records)
+
+    def append(self, record):
+        kind = self.kind
+
+        if kind == TWOSTREAMS:
+            L, segment = record
+            self.values.extend(L)
+            if segment is None:
+                x0, n, a, b = 0.0, 0, 0.0, 0.0
+            else:
+                x0, n, a, b = segment
+            self.x0.append(x0)
+            points = len(L)+n
+        else:
+            n = record[0]
+            if n > 1:
+                a, b = record[1], record[2]
+            elif n == 1:
+                a = b = 0.0
+                self.values.append(record[1])
+            elif kind == LIDAR:
+                a, b = 0.0, record[1]
+            else:
+                a = b = 0.0
+                self.values.extend(record[1:])
+            points = abs(n)
+
+        self.counts.append(n)
+        self.a.append(a)
+        self.b.append(b)
+        self.offsets.append(self.offsets[-1]+points)
+        self.voffsets.append(len(self.values))
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def npoints(self):
+        return self.offsets[-1]
+
+    def record(self, i):
+        n = self.counts[i]
+
+        if self.kind == TWOSTREAMS:
+            L = list(self.values[self.voffsets[i]:self.voffsets[i+1]])
+            if n == 0:
+                return (L, None)
+            return (L, (self.x0[i], n, self.a[i], self.b[i]))
+
+        if n > 1:
+            return (n, self.a[i], self.b[i])
+        if n == 1:
+            return (1, self.values[self.voffsets[i]])
+        if self.kind == LIDAR:
+            return (n, self.b[i])
+        return tuple([n]+self.values[self.voffsets[i]:self.voffsets[i+1]]
+                     .tolist())
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step == 1:
+                return self.slice(start, stop)
+            return SegmentStore(self.kind, map(self.record,
+                                               range(start, stop, step)))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("record index out of range")
+        return self.record(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def slice(self, start, stop):
+        """records [start, stop) as a new store, offsets starting at 0"""
+        stop = max(start, stop)
+        store = SegmentStore(self.kind)
+        store.counts = self.counts[start:stop]
+        store.a = self.a[start:stop]
+        store.b = self.b[start:stop]
+        if self.kind == TWOSTREAMS:
+            store.x0 = self.x0[start:stop]
+        v0, v1 = self.voffsets[start], self.voffsets[stop]
+        store.values = self.values[v0:v1]
+        p0 = self.offsets[start]
+        store.offsets = array('q', (p-p0 for p in self.offsets[start:stop+1]))
+        store.voffsets = array('q', (v-v0 for v in self.voffsets[start:stop+1]))
+        return store
+
+    def tobytes(self):
+        header = HEADER.pack(MAGIC, self.kind, byteorder == 'little',
+                             len(self), len(self.values))
+        columns = [self.counts, self.a, self.b, self.values, self.offsets,
+                   self.voffsets]
+        if self.kind == TWOSTREAMS:
+            columns.append(self.x0)
+        return header + b''.join(column.tobytes() for column in columns)
+
+"""
+Rebuild a store from the bytes of SegmentStore.tobytes
+"""
+def storefrombytes(data):
+    magic, kind, little, n, nvalues = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a segment store")
+
+    store = SegmentStore(kind)
+    offset = HEADER.size
+    columns = [('counts', n), ('a', n), ('b', n), ('values', nvalues),
+               ('offsets', n+1), ('voffsets', n+1)]
+    if kind == TWOSTREAMS:
+        columns.append(('x0', n))
+
+    for name, size in columns:
+        column = array(getattr(store, name).typecode)
+        end = offset+size*column.itemsize
+        if end > len(data):
+            raise ValueError("truncated segment store")
+        column.frombytes(data[offset:end])
+        if little != (byteorder == 'little'):
+            column.byteswap()
+        setattr(store, name, column)
+        offset = end
+    return store
+
+def savestore(store, filename):
+    with open(filename, "wb") as f:
+        f.write(store.tobytes())
+
+def loadstore(filename):
+    with open(filename, "rb") as f:
+        return storefrombytes(f.read())
+
+### Random access
+
+CHECKPOINT = 64                                 # records between checkpoints
+
+"""
+Number of points reconstructed from a record of the given kind
+"""
+def recordpoints(record, kind):
+    if kind == TWOSTREAMS:
+        L, segment = record
+        return len(L) + (0 if segment is None else segment[1])
+    return abs(record[0])
+
+"""
+Value of the k-th point (from 0) of a record at logical timestamp t
+"""
+def recordvalue(record, kind, k, t):
+    if kind == TWOSTREAMS:
+        L, segment = record
+        if k < len(L):
+            return L[k]
+        return segment[2]*t+segment[3]
+
+    n = record[0]
+    if n == 1:
+        return record[1]
+    if n > 1:
+        return record[1]*t+record[2]
+    if kind == LIDAR:
+        return record[1]
+    return record[k+1]
+
+"""
+Lines (first t, last t, a, b) of a record whose first point is at logical
+timestamp t, clipped to t0 <= t <= t1; singletons are lines with a = 0
+"""
+def recordpieces(record, kind, t, t0, t1):
+    if kind == TWOSTREAMS:
+        L, segment = record
+        for k in range(max(t0-t, 0), min(t1-t+1, len(L))):
+            yield (t+k, t+k, 0.0, L[k])
+        if segment is not None:
+            t += len(L)
+            p, q = max(t, t0), min(t+segment[1]-1, t1)
+            if p <= q:
+                yield (p, q, segment[2], segment[3])
+        return
+
+    n = record[0]
+    if n == 1:
+        yield (t, t, 0.0, record[1])
+    elif n > 1 or kind == LIDAR:
+        p, q = max(t, t0), min(t+abs(n)-1, t1)
+        if n > 1:
+            yield (p, q, record[1], record[2])
+        else:
+            yield (p, q, 0.0, record[1])
+    else:
+        for k in range(max(t0-t, 0), min(t1-t+1, -n)):
+            yield (t+k, t+k, 0.0, record[k+1])
+
+"""
+Count, sum, min, max and integral of the points on a sequence of lines, in
+closed form per line; the integral is the trapezoidal rule at unit steps of
+logical time, across consecutive lines too. Min and max are None if empty.
+"""
+def aggregate(pieces):
+    n, total, integral = 0, 0.0, 0.0
+    low = high = last = None
+
+    for p, q, a, b in pieces:
+        m = q-p+1
+        first, final = a*p+b, a*q+b
+        n += m
+        total += a*(p+q)*m/2 + b*m
+        integral += (first+final)*(q-p)/2
+        if last is None:
+            low, high = min(first, final), max(first, final)
+        else:
+            integral += (last+first)/2
+            low, high = min(low, first, final), max(high, first, final)
+        last = final
+
+    return n, total, low, high, integral
+
+"""
+Point lookups by logical timestamp (start for the first point, as produced by
+logicaltimestream) over a sequence of records, without replaying them from
+the beginning: the point offset of every few records is kept as a checkpoint,
+a binary search finds the checkpoint before t and the records from there are
+skipped by their counts. Records can be a list (appended to while
+compressing) or a SegmentStore, whose offsets are used as checkpoints.
+Range aggregates are computed from the covering records alone, so their cost
+is proportional to the number of records in the range, not of points.
+Records hold no timestamps: the index assumes a stream compressed against
+logical timestamps (one step per point). The coefficients of records of real
+timestamps are in another time unit and their points unevenly spaced, so
+lookups and aggregates over them would be wrong.
+"""
+class SegmentIndex():
+    def __init__(self, protocol, records=None, every=CHECKPOINT, start=1):
+        self.kind = protocol if isinstance(protocol, int) \
+                    else protocolkind(protocol)
+        self.start = start
+
+        if isinstance(records, SegmentStore):
+            self.records, self.every = records, 1
+            self.checkpoints = records.offsets
+            return
+
+        self.records = [] if records is None else records
+        self.every = every
+        self.checkpoints = array('q', [0])
+        self.nrecords = self.npoints = 0
+        for record in self.records:
+            self.count(record)
+
+    def count(self, record):
+        self.nrecords += 1
+        self.npoints += recordpoints(record, self.kind)
+        if self.nrecords % self.every == 0:
+            self.checkpoints.append(self.npoints)
+
+    # a store keeps its own offsets, which are the checkpoints
+    def append(self, record):
+        self.records.append(record)
+        if not isinstance(self.records, SegmentStore):
+            self.count(record)
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        if isinstance(self.records, SegmentStore):
+            return self.records.npoints()
+        return self.npoints
+
+    def locate(self, p):
+        """(record index, offset of its first point) of point p (from 0)"""
+        if not 0 <= p < len(self):
+            raise IndexError("timestamp out of the compressed range")
+        c = bisect_right(self.checkpoints, p)-1
+        i, offset = c*self.every, self.checkpoints[c]
+        while True:
+            points = recordpoints(self.records[i], self.kind)
+            if p < offset+points:
+                return i, offset
+            i, offset = i+1, offset+points
+
+    def value_at(self, t):
+        i, offset = self.locate(t-self.start)
+        return recordvalue(self.records[i], self.kind, t-self.start-offset, t)
+
+    def values_between(self, t0, t1):
+        """reconstructed (t,y) tuples for t0 <= t <= t1"""
+        t0, t1 = max(t0, self.start), min(t1, self.start+len(self)-1)
+        if t0 > t1:
+            return []
+        i, offset = self.locate(t0-self.start)
+        k, values = t0-self.start-offset, []
+
+        for t in range(t0, t1+1):
+            record = self.records[i]
+            if k == recordpoints(record, self.kind):
+                i, k = i+1, 0
+                record = self.records[i]
+            values.append((t, recordvalue(record, self.kind, k, t)))
+            k += 1
+        return values
+
+    def pieces(self, t0, t1):
+        """lines covering t0 <= t <= t1, see recordpieces"""
+        t0, t1 = max(t0, self.start), min(t1, self.start+len(self)-1)
+        if t0 > t1:
+            return
+        i, offset = self.locate(t0-self.start)
+        t = self.start+offset
+
+        while t <= t1:
+            record = self.records[i]
+            yield from recordpieces(record, self.kind, t, t0, t1)
+            t += recordpoints(record, self.kind)
+            i += 1
+
+    def aggregate(self, t0, t1):
+        """(count, sum, min, max, integral) over t0 <= t <= t1"""
+        return aggregate(self.pieces(t0, t1))
+
+    def sum(self, t0, t1):
+        return self.aggregate(t0, t1)[1]
+
+    def mean(self, t0, t1):
+        n, total = self.aggregate(t0, t1)[:2]
+        return total/n if n else None
+
+    def min(self, t0, t1):
+        return self.aggregate(t0, t1)[2]
+
+    def max(self, t0, t1):
+        return self.aggregate(t0, t1)[3]
+
+    def integral(self, t0, t1):
+        return self.aggregate(t0, t1)[4]
+
+    def aggregates(self, width, t0=None, t1=None):
+        """(first t, aggregate) of consecutive windows of width timestamps"""
+        t0 = self.start if t0 is None else t0
+        t1 = self.start+len(self)-1 if t1 is None else t1
+        for t in range(t0, t1+1, width):
+            yield t, self.aggregate(t, min(t+width-1, t1))